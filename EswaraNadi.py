@@ -0,0 +1,8 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from eswaranadi.app import run
+
+# The Eswara Nadi app for every Khandam in the registry (eswaranadi/khandams.py)
+run()
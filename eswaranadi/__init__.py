@@ -0,0 +1 @@
+"""Shared data layer for the Eswara Nadi Khandam apps."""
@@ -0,0 +1,353 @@
+"""The Eswara Nadi Streamlit app, for every Khandam in the registry.
+
+    streamlit run EswaraNadi.py                                       # every Khandam
+    streamlit run SuryaKhandam/EswaraNadi_SuryaKhandam_withImages.py  # one Khandam
+
+One process serves any number of Khandams and sessions. Corpus data is
+loaded through st.cache_resource, keyed by Khandam and Lagna, so it is held
+once per process and every session reads the same objects instead of an
+unpickled copy each (as st.cache_data would hand out). Those records are
+shared: the app only reads them, and per-session changes such as journaled
+verse edits are applied to new dicts on top.
+
+Widget keys carry the Khandam name, so switching Khandams never carries a
+chart's open state or an edited verse over to another Khandam.
+"""
+
+import os
+import time
+
+import pandas as pd
+import streamlit as st
+
+from eswaranadi import images, journal, metrics, render, store
+from eswaranadi.prefetch import Prefetcher
+from eswaranadi.khandams import KHANDAMS, PLANETS, SIGNS, available, path
+from eswaranadi.query import build_index, build_join_index
+from eswaranadi.search import load_index
+from eswaranadi.similarity import build_matcher
+
+MODES = ["By Lagna", "ALL Charts", "Search Configuration", "Match Natal Chart", "Search Text"]
+PAGE_SIZES = [10, 20, 30, 60, 120]
+# Every Lagna of every Khandam fits, so navigating never reloads one
+LAGNA_CACHE_ENTRIES = len(KHANDAMS) * len(SIGNS)
+
+
+# Shared, process-wide data: read-only for every session
+def _lagna_records(khandam, lagna):
+    return store.chart_records(khandam, lagna), store.verse_index(khandam, lagna)
+
+
+# Read the first page's chart images into the image caches ahead of time
+def _warm_images(records, count):
+    for row in records[0][:count]:
+        image_path = safe(row["ImagePath"])
+        if not (image_path and images.image_view(image_path)):
+            render.chart_bytes(row)
+
+
+# The Lagna cache, which also loads the Lagnas next to the one on screen in
+# the background (ALL Charts mode)
+@st.cache_resource
+def load_prefetcher():
+    return Prefetcher(_lagna_records, _warm_images, cache_entries=LAGNA_CACHE_ENTRIES)
+
+
+# Chart rows and VerseID -> verse lookup for one Lagna, from the Lagna cache;
+# a Lagna that was prefetched in the background is taken over, not loaded again
+@metrics.cached("load_lagna_records")
+def load_lagna_records(khandam, lagna):
+    return load_prefetcher().take((khandam, lagna))
+
+
+# Configuration index over the charts of every Khandam
+@st.cache_resource
+def load_config_index():
+    return build_index()
+
+
+# ConfigHash join index: the same configuration in every Khandam
+@st.cache_resource
+def load_join_index():
+    return build_join_index()
+
+
+# Natal chart matcher over the charts of every Khandam
+@st.cache_resource
+def load_chart_matcher():
+    return build_matcher()
+
+
+# Utility
+def safe(val):
+    return "" if pd.isna(val) or str(val).lower() == "nan" else str(val)
+
+
+def header(khandam):
+    title = KHANDAMS[khandam].title
+    st.markdown(f"## 🕉️ Eswara Nadi - {title}")
+    st.markdown(f"""
+Welcome to the digitized archive of the **{title}** section of the *Eswara Nadi*.
+Explore ancient planetary configurations, astrological predictions, and original chart images —
+organized by **Lagna** as given by Agasthiyar.
+---
+""")
+
+
+# Display chart image from the local variants; full resolution only on request.
+# Rows without a stored image get a chart rendered from their placements.
+def display_chart_image(khandam, row, show_image_path=False):
+    image_path, verse_id = safe(row["ImagePath"]), row["VerseID"]
+    image = images.image_bytes(image_path) if image_path else None
+    if image is None:
+        image = render.chart_bytes(row)
+        if image:
+            st.image(image, width="stretch")
+            return
+    if image:
+        if st.checkbox("🔍 Full resolution", key=f"full_{khandam}_{verse_id}"):
+            image = images.image_bytes(image_path, "full")
+        st.image(image, width="stretch")
+        if show_image_path:
+            st.caption(f"🖼️ ImagePath: `{image_path}`")
+    else:
+        st.info("📁 Image not available.")
+
+
+# Readings of the same configuration in the other Khandams
+def display_siblings(khandam, row):
+    siblings = load_join_index().siblings(khandam, row)
+    if siblings.empty:
+        return
+    st.markdown("**🔗 Same configuration in other Khandams:**")
+    for sibling in siblings.itertuples():
+        st.markdown(f"- **{sibling.Khandam}** `{sibling.VerseID}`: {safe(sibling.Result)}")
+
+
+# Display verse block
+def display_verse_block(khandam, verse_id, verses, editable=False):
+    # Journaled edits are applied per verse, so the cached Lagna data never goes stale
+    verse = journal.overlay(khandam, verses.get(verse_id))
+    if verse is not None:
+        tamil = safe(verse.get("TamilVerse", ""))
+        english = safe(verse.get("EnglishTranslation", ""))
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown("**📝 Tamil Verse**")
+            st.write(tamil)
+        with col2:
+            st.markdown("**📘 English Translation**")
+            st.write(english)
+
+        if editable:
+            st.markdown("### ✏️ Edit Verse")
+            # Version of the text this session started editing from
+            base_key = f"base_{khandam}_{verse_id}"
+            if base_key not in st.session_state:
+                st.session_state[base_key] = journal.verse_version(tamil, english)
+            new_tamil = st.text_area("Tamil Verse", value=tamil, key=f"tamil_{khandam}_{verse_id}")
+            new_english = st.text_area("English Translation", value=english, key=f"english_{khandam}_{verse_id}")
+            if st.button(f"💾 Save Verse {verse_id}", key=f"save_{khandam}_{verse_id}"):
+                try:
+                    st.session_state[base_key] = journal.save(
+                        khandam, safe(verse.get("Lagna")), verse_id,
+                        new_tamil, new_english, st.session_state[base_key],
+                    )
+                except journal.ConflictError as e:
+                    # Saving again overwrites the other edit knowingly
+                    st.session_state[base_key] = e.current["version"]
+                    st.warning(f"⚠️ Verse `{verse_id}` was changed in another session. Save again to overwrite it with your text.")
+                    st.write(e.current["TamilVerse"])
+                    st.write(e.current["EnglishTranslation"])
+                else:
+                    st.success(f"✅ Verse `{verse_id}` updated successfully.")
+    else:
+        st.info(f"📜 Verse not available for `{verse_id}`.")
+
+
+# Display one page of a Lagna's charts; an expander's body is only built while it is open
+def display_charts(khandam, lagna, page_size, editable=False, show_image_path=False):
+    charts, verses = load_lagna_records(khandam, lagna)
+    if not verses:
+        st.warning(f"⚠️ Verse file not found for `{lagna}`.")
+    if not charts:
+        st.warning("No charts found.")
+        return
+    pages = -(-len(charts) // page_size)
+    page = 1
+    if pages > 1:
+        page = st.number_input(f"Page (1–{pages})", min_value=1, max_value=pages, value=1, key=f"page_{khandam}_{lagna}")
+    start = (page - 1) * page_size
+    st.caption(f"Charts {start + 1}–{min(start + page_size, len(charts))} of {len(charts)}")
+
+    for row in charts[start:start + page_size]:
+        expander = st.expander(
+            f"📊 {row['Lagna']} Lagna — Chart ID: {row['VerseID']}",
+            key=f"chart_{khandam}_{row['VerseID']}",
+            on_change="rerun",
+        )
+        with expander:
+            if not expander.open:
+                continue
+            with metrics.timer("expander_render_seconds", khandam=khandam):
+                st.markdown(
+                    f"**Sun:** {safe(row['Sun'])} | "
+                    f"**Moon:** {safe(row['Moon'])} | "
+                    f"**Mars:** {safe(row['Mars'])} | "
+                    f"**Mercury:** {safe(row['Mercury'])} | "
+                    f"**Jupiter:** {safe(row['Jupiter'])} | "
+                    f"**Venus:** {safe(row['Venus'])} | "
+                    f"**Saturn:** {safe(row['Saturn'])} | "
+                    f"**Rahu:** {safe(row['Rahu'])} | "
+                    f"**Ketu:** {safe(row['Ketu'])}"
+                )
+                display_chart_image(khandam, row, show_image_path)
+                display_verse_block(khandam, row["VerseID"], verses, editable=editable)
+                st.markdown("**Result:**")
+                st.write(safe(row["Result"]))
+                display_siblings(khandam, row)
+
+
+# Mode: Search Configuration
+def search_configuration():
+    st.subheader("🔍 Search Configuration (all Khandams)")
+    config_query = st.text_input(
+        "Configuration",
+        placeholder="Mars in Aries AND Jupiter in Libra AND Ketu conjunct Mars",
+        key="config_query",
+    )
+    st.caption(
+        "Terms: `<planet> in <sign>`, `<planet> conjunct <planet>`, `<planet> in house <n>`, "
+        "`<planet> in kendra|trikona|dusthana|upachaya`, `<planet> exalted|debilitated`, "
+        "`<planet> in own|friendly|neutral|enemy sign`, `<planet> aspected by <planet>`, "
+        "`Lagna <sign>`, `Khandam <name>`, joined by AND."
+    )
+    if config_query:
+        try:
+            results = load_config_index().query(config_query)
+        except ValueError as e:
+            st.warning(f"⚠️ {e}")
+        else:
+            if results.empty:
+                st.info("No charts match this configuration.")
+            else:
+                st.markdown(f"**{len(results)}** matching charts")
+                st.dataframe(results, width="stretch", hide_index=True)
+
+
+# Mode: Match Natal Chart
+def match_natal_chart():
+    st.subheader("🪐 Match Natal Chart (all Khandams)")
+    natal = {"Lagna": st.selectbox("Lagna", SIGNS, key="natal_lagna")}
+    planet_cols = st.columns(3)
+    for i, planet in enumerate(PLANETS):
+        with planet_cols[i % 3]:
+            natal[planet] = st.selectbox(planet, [""] + SIGNS, key=f"natal_{planet}")
+    top_k = st.slider("Number of matches", 5, 50, 10, key="natal_top_k")
+
+    if any(natal[planet] for planet in natal if planet != "Lagna"):
+        matches = load_chart_matcher().top_k(natal, top_k)
+        st.dataframe(matches, width="stretch", hide_index=True)
+    else:
+        st.info("Enter the signs of the planets in the natal chart.")
+
+
+# Mode: Search Text
+def search_text():
+    st.subheader("🔎 Search Verses (all Khandams)")
+    text_query = st.text_input("Search Tamil verses, translations and results", placeholder="சகோதர", key="text_query")
+    if text_query:
+        hits = load_index().search(text_query, 20)
+        if not hits:
+            st.info("No verses match this search.")
+        for score, (khandam, lagna, verse_id) in hits:
+            with st.expander(f"📜 {khandam} Khandam — {lagna} Lagna — {verse_id} (score {score:.2f})"):
+                charts, verses = load_lagna_records(khandam, lagna)
+                verse = journal.overlay(khandam, verses.get(verse_id)) or {}
+                chart = next((row for row in charts if row["VerseID"] == verse_id), {})
+                st.write(safe(verse.get("TamilVerse")))
+                st.write(safe(verse.get("EnglishTranslation")))
+                st.markdown("**Result:**")
+                st.write(safe(chart.get("Result")))
+
+
+# Performance panel
+def performance_panel():
+    if st.sidebar.checkbox("📊 Performance", key="show_performance"):
+        with st.sidebar:
+            st.markdown("**This session**")
+            st.dataframe(pd.DataFrame(st.session_state["metrics"].rows()), hide_index=True)
+            st.markdown("**This process**")
+            st.dataframe(pd.DataFrame(metrics.PROCESS.rows()), hide_index=True)
+            st.download_button("⬇️ Prometheus metrics", metrics.PROCESS.to_prometheus(), "eswaranadi.prom", "text/plain")
+
+
+def run(khandam=None, show_image_path=False):
+    """Render the app for one Khandam, or with a Khandam picker in the sidebar when None."""
+    # Timings and counters of this rerun go to the session's and the process's registry
+    run_start = time.perf_counter()
+    metrics.bind(st.session_state.setdefault("metrics", metrics.Registry()))
+
+    if khandam is None:
+        st.set_page_config(page_title="Eswara Nadi", layout="wide")
+        names = available()
+        khandam = st.sidebar.selectbox("📚 Khandam", names, format_func=lambda k: KHANDAMS[k].title, key="khandam")
+        pending = [KHANDAMS[k].title for k in KHANDAMS if k not in names]
+        if pending:
+            st.sidebar.caption(f"Not digitized yet: {', '.join(pending)}")
+        if not names:
+            st.info("📚 No Khandam has been digitized yet: add a Khandam's chart CSV to see it here.")
+            st.stop()
+    else:
+        st.set_page_config(page_title=f"Eswara Nadi - {KHANDAMS[khandam].title}", layout="wide")
+    header(khandam)
+
+    # The chart table itself is only loaded a Lagna at a time
+    chart_csv = KHANDAMS[khandam].chart_csv
+    if not os.path.exists(path(chart_csv)):
+        st.error(f"❌ Chart data not found: `{chart_csv}`")
+        st.stop()
+
+    # Sidebar controls
+    mode = st.sidebar.radio("📋 View Mode", MODES)
+    edit_mode = st.sidebar.checkbox("✏️ Enable Verse Editing")
+    page_size = st.sidebar.select_slider("📄 Charts per page", options=PAGE_SIZES, value=20)
+
+    if mode == "By Lagna":
+        selected_lagna = st.selectbox("Select Lagna", SIGNS, key="lagna_select")
+        st.subheader(f"🔯 Lagna: {selected_lagna}")
+        display_charts(khandam, selected_lagna, page_size, edit_mode, show_image_path)
+
+    elif mode == "ALL Charts":
+        if "chart_index" not in st.session_state:
+            st.session_state.chart_index = 0
+
+        col1, col2 = st.columns([1, 6])
+        with col1:
+            if st.button("⬅️ Previous") and st.session_state.chart_index > 0:
+                st.session_state.chart_index -= 1
+        with col2:
+            if st.button("Next ➡️") and st.session_state.chart_index < len(SIGNS) - 1:
+                st.session_state.chart_index += 1
+
+        current_lagna = SIGNS[st.session_state.chart_index]
+        st.subheader(f"🔯 Lagna: {current_lagna}")
+        display_charts(khandam, current_lagna, page_size, edit_mode, show_image_path)
+
+        # Load the previous and next Lagnas while this one is being read
+        prefetcher = load_prefetcher()
+        for index in (st.session_state.chart_index + 1, st.session_state.chart_index - 1):
+            if 0 <= index < len(SIGNS):
+                prefetcher.prefetch((khandam, SIGNS[index]), page_size)
+
+    elif mode == "Search Configuration":
+        search_configuration()
+    elif mode == "Match Natal Chart":
+        match_natal_chart()
+    elif mode == "Search Text":
+        search_text()
+
+    metrics.observe("rerun_seconds", time.perf_counter() - run_start, khandam=khandam, mode=mode)
+    metrics.export()
+    performance_panel()
@@ -0,0 +1,213 @@
+"""Headless batch matching of natal charts against the Khandam chart tables.
+
+    python -m eswaranadi.batch charts.jsonl -o matches.jsonl --workers 4
+
+Input is JSONL (one object per line) or CSV with a header, holding a Lagna
+and the nine planet columns (Sun ... Ketu) as sign names, plus an optional
+"id". "-" reads stdin. Output is one JSON line per input chart, in input
+order:
+
+    {"id": ..., "matches": [{"Khandam", "Lagna", "VerseID", "match",
+                             "Result", "TamilVerse", "EnglishTranslation"}]}
+
+A verse matches when every planet it places is satisfied by the natal
+chart: "exact" when the Lagna and the signs agree, "house" when the
+planets sit in the same houses counted from each chart's own Lagna. Rows
+that place no planet at all never match.
+
+Charts are read in chunks and handed to a process pool with a bounded
+number of chunks in flight, so memory stays flat however long the input
+is. Every worker loads the chart tables once, in its initializer. A
+malformed JSONL line stops the run with its line number.
+"""
+
+import argparse
+import csv
+import io
+import itertools
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from eswaranadi import journal, store
+from eswaranadi.khandams import KHANDAMS, PLANETS, SIGNS, available
+from eswaranadi.similarity import natal_codes
+
+DEFAULT_KHANDAMS = ["Kuja", "Surya", "Chandra"]
+CHUNK_SIZE = 256
+
+
+class PlacementMatcher:
+    """Exact and house-relative matching of natal charts against chart rows."""
+
+    def __init__(self, charts, verses=None):
+        self.charts = charts.reset_index(drop=True)
+        self.verses = verses or {}
+        self.codes = np.stack([self.charts[p].cat.codes.to_numpy() for p in PLANETS], axis=1)
+        self.lagna = self.charts["Lagna"].cat.codes.to_numpy()
+        self.given = self.codes >= 0
+        # Placeholder rows that place no planet would match every chart
+        self.placed = self.given.any(axis=1)
+        self.houses = (self.codes - self.lagna[:, None]) % len(SIGNS)
+        self.keys = self.charts[["Khandam", "Lagna", "VerseID"]].astype(str).values.tolist()
+        self.results = self.charts["Result"].tolist()
+
+    def match(self, natals):
+        """For each natal chart, [(row, "exact" | "house")] of the matching chart rows."""
+        if not natals:
+            return []
+        codes = [natal_codes(natal) for natal in natals]
+        lagna = np.array([c[0] for c in codes])
+        planets = np.stack([c[1] for c in codes])
+        houses = np.where(planets >= 0, (planets - lagna[:, None]) % len(SIGNS), -1)
+        houses[lagna < 0] = -1
+
+        # (charts, rows, planets): a placement the verse leaves out always passes
+        free = ~self.given[None]
+        sign_ok = ((planets[:, None, :] == self.codes[None]) | free).all(axis=2)
+        exact = sign_ok & (lagna[:, None] == self.lagna[None])
+        house = ((houses[:, None, :] == self.houses[None]) | free).all(axis=2) & (lagna[:, None] >= 0)
+
+        matches = []
+        for i in range(len(natals)):
+            rows = np.flatnonzero((exact[i] | house[i]) & self.placed)
+            matches.append([(row, "exact" if exact[i, row] else "house") for row in rows])
+        return matches
+
+    def records(self, natal_id, matches):
+        out = []
+        for row, kind in matches:
+            khandam, lagna, verse_id = self.keys[row]
+            verse = self.verses.get((khandam, lagna, verse_id), {})
+            out.append({
+                "Khandam": khandam,
+                "Lagna": lagna,
+                "VerseID": verse_id,
+                "match": kind,
+                "Result": self.results[row],
+                "TamilVerse": verse.get("TamilVerse", ""),
+                "EnglishTranslation": verse.get("EnglishTranslation", ""),
+            })
+        return {"id": natal_id, "matches": out}
+
+
+def build_matcher(khandams=DEFAULT_KHANDAMS):
+    """PlacementMatcher over the given Khandams, with their verses (journal edits applied)."""
+    charts = pd.concat([store.load_charts(k) for k in khandams], ignore_index=True)
+    verses = {}
+    for khandam in khandams:
+        for record in store.load_verses(khandam).to_dict("records"):
+            record = journal.overlay(khandam, {**record, "Lagna": str(record["Lagna"])})
+            verses[(khandam, record["Lagna"], record["VerseID"])] = record
+    return PlacementMatcher(charts, verses)
+
+
+# Worker processes
+_matcher = None
+
+
+def _init_worker(khandams):
+    global _matcher
+    _matcher = build_matcher(khandams)
+
+
+def _match_chunk(chunk):
+    natals = [natal for _, natal in chunk]
+    lines = []
+    for (natal_id, _), matches in zip(chunk, _matcher.match(natals)):
+        lines.append(json.dumps(_matcher.records(natal_id, matches), ensure_ascii=False))
+    return "\n".join(lines) + "\n"
+
+
+# Input
+def _jsonl_rows(stream):
+    for lineno, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"line {lineno}: not valid JSON ({e})") from None
+        if not isinstance(row, dict):
+            raise ValueError(f"line {lineno}: not a JSON object")
+        yield row
+
+
+def read_charts(stream, fmt):
+    """Yield (id, natal chart dict) from a JSONL or CSV text stream; raises ValueError on a malformed JSONL line."""
+    rows = csv.DictReader(stream) if fmt == "csv" else _jsonl_rows(stream)
+    for n, row in enumerate(rows, 1):
+        natal_id = row.get("id", n)
+        yield natal_id, {key: row.get(key) for key in ["Lagna"] + PLANETS}
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run(charts, out, khandams=DEFAULT_KHANDAMS, workers=None, chunk_size=CHUNK_SIZE):
+    """Match (id, natal) pairs and write JSON lines to `out` in input order; returns the count."""
+    count = 0
+    max_pending = 2 * (workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(khandams,)) as pool:
+        pending = deque()
+        for chunk in chunked(charts, chunk_size):
+            pending.append(pool.submit(_match_chunk, chunk))
+            count += len(chunk)
+            # Bounded in-flight work: wait for the oldest chunk before reading further
+            while len(pending) >= max_pending:
+                out.write(pending.popleft().result())
+        while pending:
+            out.write(pending.popleft().result())
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Match natal charts against the Khandam chart tables.")
+    parser.add_argument("input", help="JSONL or CSV file of natal charts, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="JSONL output file (default: stdout)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="input format (default: from the file name)")
+    parser.add_argument("--khandams", nargs="+", default=DEFAULT_KHANDAMS, help="Khandams to match against")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="charts per work unit")
+    args = parser.parse_args(argv)
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+    unknown = set(args.khandams) - set(KHANDAMS)
+    if unknown:
+        parser.error(f"unknown Khandam: {', '.join(sorted(unknown))}")
+    missing = set(args.khandams) - set(available())
+    if missing:
+        parser.error(f"Khandam not digitized yet: {', '.join(sorted(missing))}")
+    fmt = args.format or ("csv" if args.input.lower().endswith(".csv") else "jsonl")
+
+    if args.input == "-":
+        source = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8-sig")
+    else:
+        source = open(args.input, encoding="utf-8-sig", newline="")
+    target = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        count = run(read_charts(source, fmt), target, args.khandams, args.workers, args.chunk_size)
+    except ValueError as e:
+        raise SystemExit(f"{args.input}: {e}")
+    finally:
+        source.close()
+        if target is not sys.stdout:
+            target.close()
+    print(f"{count} charts matched", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
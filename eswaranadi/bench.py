@@ -0,0 +1,276 @@
+"""Benchmarks of the load, cache-hit and render paths on a synthetic corpus.
+
+    python -m eswaranadi.bench --verses 60
+    python -m eswaranadi.bench --compare build/bench/old.json build/bench/new.json
+
+generates (once) a corpus of 7 Khandams x 12 Lagnas x N verses with
+eswaranadi.synthetic, then runs every case in a fresh Python process
+pointed at it through ESWARANADI_ROOT, so "cold" really is cold:
+
+    store_build  compiling the CSVs into the corpus store
+    cold_csv     loading chart tables and single Lagnas without a store (CSV fallback)
+    cold_store   the same loaders through the store, first calls in the process
+    warm         the app's Lagna loader (its process-wide cache), after the first (missing) call
+    apptest      the app run headlessly with AppTest for each Khandam: the first run,
+                 then every Lagna with its first page collapsed and with all its
+                 expanders open
+    service      the JSON service's load test (eswaranadi.service): a cold pass over
+                 its paths, then full fetches and 304 revalidations from memory
+
+Timings are in milliseconds. Results go to build/bench/<commit>-n<N>.json,
+with the commit, machine and corpus size, and --compare prints the ratio of
+every timing between two result files.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CASES = ["store_build", "cold_csv", "cold_store", "warm", "apptest", "service"]
+APP = "EswaraNadi.py"
+PAGE_SIZE = 20
+SERVICE_REQUESTS = 5000
+SERVICE_CONCURRENCY = 16
+REGRESSION = 1.2
+
+
+def summary(samples):
+    """Summary statistics of a list of millisecond timings."""
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "total_ms": round(sum(ordered), 3),
+        "median_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 3),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return (time.perf_counter() - start) * 1000, result
+
+
+# Cases, each run in its own process with ESWARANADI_ROOT set
+def case_store_build(args):
+    from eswaranadi import store
+
+    elapsed, _ = _timed(store.build)
+    return {"build_ms": round(elapsed, 3)}
+
+
+def _loader_timings(store_dir):
+    from eswaranadi import store
+    from eswaranadi.khandams import SIGNS, available
+
+    charts, lagnas = [], []
+    for khandam in available():
+        elapsed, _ = _timed(store.load_charts, khandam, store_dir=store_dir)
+        charts.append(elapsed)
+        for lagna in SIGNS:
+            elapsed, _ = _timed(lambda: (store.chart_records(khandam, lagna, store_dir),
+                                         store.verse_index(khandam, lagna, store_dir)))
+            lagnas.append(elapsed)
+    first = {"load_chart_data_ms": round(charts[0], 3), "load_lagna_records_ms": round(lagnas[0], 3)}
+    return {"first_call": first, "load_chart_data": summary(charts), "load_lagna_records": summary(lagnas)}
+
+
+def case_cold_csv(args):
+    from eswaranadi.khandams import path
+
+    # A store directory that never exists forces the CSV fallback
+    return _loader_timings(path("build/no-store"))
+
+
+def case_cold_store(args):
+    from eswaranadi import store
+
+    # Run on its own, the case builds the store first (untimed)
+    if not os.path.exists(os.path.join(store.STORE_DIR, store.MANIFEST)):
+        store.build()
+    return _loader_timings(store.STORE_DIR)
+
+
+def case_warm(args):
+    import logging
+
+    from eswaranadi.khandams import SIGNS, available
+
+    # Outside `streamlit run` the caches work but warn about the missing runtime
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    from eswaranadi import metrics
+    from eswaranadi.app import load_lagna_records
+
+    misses = {"load_lagna_records": []}
+    hits = {"load_lagna_records": []}
+    results = {}
+    for timings in (misses, hits):
+        before = dict(metrics.PROCESS.counters)
+        for _ in range(1 if timings is misses else args.repeat):
+            for khandam in available():
+                for lagna in SIGNS:
+                    timings["load_lagna_records"].append(_timed(load_lagna_records, khandam, lagna)[0])
+        # The loaders' own counters say what each round really was
+        expected = "miss" if timings is misses else "hit"
+        for name, samples in timings.items():
+            key = ("cache_requests_total", (("cache", name), ("result", expected)))
+            counted = metrics.PROCESS.counters.get(key, 0) - before.get(key, 0)
+            if counted != len(samples):
+                raise RuntimeError(f"{name}: {counted} of {len(samples)} calls were counted as cache {expected}")
+        results[expected] = {name: summary(samples) for name, samples in timings.items()}
+    return results
+
+
+def case_apptest(args):
+    import logging
+
+    from streamlit.testing.v1 import AppTest
+    from eswaranadi import store
+    from eswaranadi.khandams import SIGNS, available
+
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    results = {}
+    for khandam in available():
+        # A fresh AppTest per Khandam: its first run pays that Khandam's cold loads
+        at = AppTest.from_file(os.path.join(REPO, APP), default_timeout=args.timeout)
+        at.session_state["khandam"] = khandam
+        elapsed, _ = _timed(at.run)
+        errors = [e.value for e in at.exception]
+        collapsed, expanded = [], []
+        for lagna in SIGNS:
+            at.selectbox(key="lagna_select").set_value(lagna)
+            collapsed.append(_timed(at.run)[0])
+            for row in store.chart_records(khandam, lagna)[:PAGE_SIZE]:
+                at.session_state[f"chart_{khandam}_{row['VerseID']}"] = True
+            expanded.append(_timed(at.run)[0])
+            errors += [e.value for e in at.exception]
+        results[khandam] = {
+            "first_run_ms": round(elapsed, 3),
+            "lagna_collapsed": summary(collapsed),
+            "lagna_expanded": summary(expanded),
+            "errors": errors,
+        }
+    return results
+
+
+def case_service(args):
+    from eswaranadi.service import load_test
+
+    return load_test(requests=SERVICE_REQUESTS, concurrency=SERVICE_CONCURRENCY)
+
+
+# Orchestration
+def _commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO, capture_output=True, text=True)
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+
+def _run_case(name, corpus, args):
+    env = {**os.environ, "ESWARANADI_ROOT": corpus}
+    command = [sys.executable, "-m", "eswaranadi.bench", "--run-case", name,
+               "--repeat", str(args.repeat), "--timeout", str(args.timeout)]
+    out = subprocess.run(command, cwd=REPO, env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        return {"error": out.stderr.strip().splitlines()[-1:] or [f"exit status {out.returncode}"]}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def run(args):
+    from eswaranadi import synthetic
+    from eswaranadi.khandams import REGISTRY, SIGNS, path
+
+    corpus = os.path.abspath(args.corpus or path(f"build/synthetic/n{args.verses}"))
+    if args.regenerate or not os.path.exists(os.path.join(corpus, REGISTRY)):
+        synthetic.generate(corpus, args.verses)
+    with open(os.path.join(corpus, REGISTRY), encoding="utf-8") as f:
+        khandams = [entry["name"] for entry in json.load(f)]
+    # Start from a corpus without any built store, images or indexes
+    shutil.rmtree(os.path.join(corpus, "build"), ignore_errors=True)
+
+    commit = _commit()
+    results = {
+        "meta": {
+            "commit": commit,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "corpus": corpus,
+            "khandams": khandams,
+            "lagnas": len(SIGNS),
+            "verses_per_lagna": args.verses,
+            "repeat": args.repeat,
+        },
+        "cases": {},
+    }
+    for name in args.cases:
+        print(f"{name} ...", file=sys.stderr)
+        results["cases"][name] = _run_case(name, corpus, args)
+
+    out = args.out or path(f"build/bench/{commit or 'results'}-n{args.verses}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=1)
+    print(out)
+
+
+def _flatten(results, prefix=""):
+    values = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            values.update(_flatten(value, f"{name}."))
+        elif key.endswith("_ms") and isinstance(value, (int, float)):
+            values[name] = value
+    return values
+
+
+def compare(old_file, new_file):
+    """Print every timing of two result files side by side; flags slowdowns over REGRESSION."""
+    with open(old_file, encoding="utf-8") as f:
+        old = _flatten(json.load(f)["cases"])
+    with open(new_file, encoding="utf-8") as f:
+        new = _flatten(json.load(f)["cases"])
+    for name in sorted(old.keys() & new.keys()):
+        ratio = new[name] / old[name] if old[name] else float("inf")
+        flag = "  slower" if ratio > REGRESSION else ""
+        print(f"{name:60s} {old[name]:10.2f} {new[name]:10.2f} {ratio:6.2f}x{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the load, cache-hit and render paths.")
+    parser.add_argument("--verses", type=int, default=60, help="verses per Lagna and Khandam in the synthetic corpus")
+    parser.add_argument("--corpus", help="corpus directory (default: build/synthetic/n<verses>)")
+    parser.add_argument("--regenerate", action="store_true", help="regenerate the corpus even if it exists")
+    parser.add_argument("--cases", nargs="+", default=CASES, help="cases to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=20, help="cache-hit rounds in the warm case")
+    parser.add_argument("--timeout", type=float, default=120, help="AppTest run timeout in seconds")
+    parser.add_argument("--out", help="results file (default: build/bench/<commit>-n<verses>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two results files")
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_case:
+        print(json.dumps(globals()[f"case_{args.run_case}"](args)))
+    elif args.compare:
+        compare(*args.compare)
+    else:
+        unknown = set(args.cases) - set(CASES)
+        if unknown:
+            parser.error(f"unknown case: {', '.join(sorted(unknown))}")
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
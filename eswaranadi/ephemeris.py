@@ -0,0 +1,157 @@
+"""Offline sidereal sign table of the nine grahas.
+
+    python -m eswaranadi.ephemeris --from 1900-01-01 --to 2100-12-31
+
+computes, for every day at 00:00 UT (05:30 IST, about sunrise in India),
+the sidereal sign of the Sun, Moon, Mars, Mercury, Jupiter, Venus, Saturn,
+Rahu and Ketu, and writes them to eswaranadi/data/sidereal_signs.npz as
+int8 sign indices (0 = Aries), compressed. The table ships with the
+package, so the sky-scan needs no ephemeris library or network.
+
+Positions come from the low-precision orbital elements and perturbation
+terms of Paul Schlyter's "How to compute planetary positions", good to a
+few arcminutes, with the mean lunar node for Rahu (Ketu opposite) and a
+linear Lahiri ayanamsa. A planet within a few arcminutes of a sign
+boundary can come out in the neighbouring sign for a day; everything is
+computed with NumPy over all days at once.
+"""
+
+import argparse
+import datetime
+import os
+
+import numpy as np
+
+from eswaranadi.khandams import PLANETS
+
+TABLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "sidereal_signs.npz")
+FIRST = datetime.date(1900, 1, 1)
+LAST = datetime.date(2100, 12, 31)
+
+# Days from this date are Schlyter's day number d (2000 Jan 0.0 UT)
+EPOCH = datetime.date(1999, 12, 31)
+# Lahiri ayanamsa at the epoch and its yearly growth, in degrees
+AYANAMSA = 23.853
+AYANAMSA_RATE = 50.2788 / 3600
+
+# Orbital elements: (N, i, w, a, e, M), each as (value at d = 0, change per day)
+ELEMENTS = {
+    "Mercury": [(48.3313, 3.24587e-5), (7.0047, 5.00e-8), (29.1241, 1.01444e-5),
+                (0.387098, 0), (0.205635, 5.59e-10), (168.6562, 4.0923344368)],
+    "Venus": [(76.6799, 2.46590e-5), (3.3946, 2.75e-8), (54.8910, 1.38374e-5),
+              (0.723330, 0), (0.006773, -1.302e-9), (48.0052, 1.6021302244)],
+    "Mars": [(49.5574, 2.11081e-5), (1.8497, -1.78e-8), (286.5016, 2.92961e-5),
+             (1.523688, 0), (0.093405, 2.516e-9), (18.6021, 0.5240207766)],
+    "Jupiter": [(100.4542, 2.76854e-5), (1.3030, -1.557e-7), (273.8777, 1.64505e-5),
+                (5.20256, 0), (0.048498, 4.469e-9), (19.8950, 0.0830853001)],
+    "Saturn": [(113.6634, 2.38980e-5), (2.4886, -1.081e-7), (339.3939, 2.97661e-5),
+               (9.55475, 0), (0.055546, -9.499e-9), (316.9670, 0.0334442282)],
+}
+SUN = [(0.0, 0), (0.0, 0), (282.9404, 4.70935e-5), (1.0, 0), (0.016709, -1.151e-9), (356.0470, 0.9856002585)]
+MOON = [(125.1228, -0.0529538083), (5.1454, 0), (318.0634, 0.1643573223),
+        (60.2666, 0), (0.054900, 0), (115.3654, 13.0649929509)]
+
+
+def _sin(degrees):
+    return np.sin(np.radians(degrees))
+
+
+def _cos(degrees):
+    return np.cos(np.radians(degrees))
+
+
+def _elements(elements, d):
+    return [value + rate * d for value, rate in elements]
+
+
+def _orbit(elements, d):
+    """Ecliptic (x, y, z) of a body in its orbit, and its mean anomaly."""
+    N, i, w, a, e, M = _elements(elements, d)
+    M = M % 360
+    E = M + np.degrees(e * _sin(M) * (1 + e * _cos(M)))
+    for _ in range(5):
+        E = E - (E - np.degrees(e * _sin(E)) - M) / (1 - e * _cos(E))
+    xv, yv = a * (_cos(E) - e), a * np.sqrt(1 - e * e) * _sin(E)
+    v, r = np.degrees(np.arctan2(yv, xv)), np.hypot(xv, yv)
+    x = r * (_cos(N) * _cos(v + w) - _sin(N) * _sin(v + w) * _cos(i))
+    y = r * (_sin(N) * _cos(v + w) + _cos(N) * _sin(v + w) * _cos(i))
+    z = r * _sin(v + w) * _sin(i)
+    return x, y, z, M
+
+
+def tropical_longitudes(d):
+    """{planet: tropical ecliptic longitude of date, degrees} for an array of day numbers."""
+    xs, ys, _, Ms = _orbit(SUN, d)
+    sun = np.degrees(np.arctan2(ys, xs))
+    longitudes = {"Sun": sun}
+
+    x, y, _, Mm = _orbit(MOON, d)
+    Nm, _, wm = _elements(MOON[:3], d)
+    Lm, Ls = Mm + wm + Nm, Ms + SUN[2][0] + SUN[2][1] * d
+    D, F = Lm - Ls, Lm - Nm
+    longitudes["Moon"] = np.degrees(np.arctan2(y, x)) + (
+        -1.274 * _sin(Mm - 2 * D) + 0.658 * _sin(2 * D) - 0.186 * _sin(Ms)
+        - 0.059 * _sin(2 * Mm - 2 * D) - 0.057 * _sin(Mm - 2 * D + Ms) + 0.053 * _sin(Mm + 2 * D)
+        + 0.046 * _sin(2 * D - Ms) + 0.041 * _sin(Mm - Ms) - 0.035 * _sin(D)
+        - 0.031 * _sin(Mm + Ms) - 0.015 * _sin(2 * F - 2 * D) + 0.011 * _sin(Mm - 4 * D)
+    )
+
+    Mj = _elements(ELEMENTS["Jupiter"][5:], d)[0]
+    Mst = _elements(ELEMENTS["Saturn"][5:], d)[0]
+    perturbations = {
+        "Jupiter": -0.332 * _sin(2 * Mj - 5 * Mst - 67.6) - 0.056 * _sin(2 * Mj - 2 * Mst + 21)
+        + 0.042 * _sin(3 * Mj - 5 * Mst + 21) - 0.036 * _sin(Mj - 2 * Mst) + 0.022 * _cos(Mj - Mst)
+        + 0.023 * _sin(2 * Mj - 3 * Mst + 52) - 0.016 * _sin(Mj - 5 * Mst - 69),
+        "Saturn": 0.812 * _sin(2 * Mj - 5 * Mst - 67.6) - 0.229 * _cos(2 * Mj - 4 * Mst - 2)
+        + 0.119 * _sin(Mj - 2 * Mst - 3) + 0.046 * _sin(2 * Mj - 6 * Mst - 69)
+        + 0.014 * _sin(Mj - 3 * Mst + 32),
+    }
+    for planet, elements in ELEMENTS.items():
+        x, y, z, _ = _orbit(elements, d)
+        # The planet's heliocentric longitude is perturbed, then moved to the Earth
+        r = np.sqrt(x * x + y * y + z * z)
+        lon = np.degrees(np.arctan2(y, x)) + perturbations.get(planet, 0)
+        lat = np.arcsin(z / r)
+        x, y = r * np.cos(lat) * _cos(lon), r * np.cos(lat) * _sin(lon)
+        longitudes[planet] = np.degrees(np.arctan2(y + ys, x + xs))
+
+    longitudes["Rahu"] = _elements(MOON[:1], d)[0]
+    longitudes["Ketu"] = longitudes["Rahu"] + 180
+    return longitudes
+
+
+def ayanamsa(d):
+    """Lahiri ayanamsa in degrees for an array of day numbers."""
+    return AYANAMSA + AYANAMSA_RATE * d / 365.25
+
+
+def sidereal_signs(first=FIRST, last=LAST):
+    """(days, 9) int8 sidereal sign indices, PLANETS order, one row per day from first to last."""
+    d = np.arange((first - EPOCH).days, (last - EPOCH).days + 1, dtype=np.float64)
+    longitudes = tropical_longitudes(d)
+    sidereal = np.stack([longitudes[planet] for planet in PLANETS], axis=1) - ayanamsa(d)[:, None]
+    return (np.floor(sidereal % 360 / 30) % 12).astype(np.int8)
+
+
+def build(filename=TABLE, first=FIRST, last=LAST):
+    """Write the sign table for first..last; returns its number of days."""
+    signs = sidereal_signs(first, last)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    np.savez_compressed(filename, signs=signs, first=np.array(first.toordinal()), planets=np.array(PLANETS))
+    return len(signs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute the bundled sidereal sign table.")
+    parser.add_argument("--from", dest="first", type=datetime.date.fromisoformat, default=FIRST)
+    parser.add_argument("--to", dest="last", type=datetime.date.fromisoformat, default=LAST)
+    parser.add_argument("--out", default=TABLE, help="table file (default: eswaranadi/data/sidereal_signs.npz)")
+    args = parser.parse_args(argv)
+    if args.last < args.first:
+        parser.error("--to is before --from")
+    days = build(args.out, args.first, args.last)
+    print(f"{days} days from {args.first} to {args.last} in {args.out}")
+
+
+if __name__ == "__main__":
+    main()
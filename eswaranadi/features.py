@@ -0,0 +1,188 @@
+"""Derived chart features: houses, conjunctions, aspects, lordship and dignity.
+
+`derive(charts)` turns the Lagna and planet columns of a whole chart table
+into these columns, with NumPy over every row at once:
+
+    <planet>_House       house from the Lagna, 1-12 (0 when the row does not place it)
+    <planet>_Dignity     exalted, own, friendly, neutral, enemy or debilitated
+    <planet>_Dispositor  lord of the sign the planet is in
+    <planet>_Conjunct    planets in the same sign, as a bitmask over PLANETS
+    <planet>_AspectedBy  planets aspecting it (graha drishti), bitmask over PLANETS
+    <planet>_Lords       houses whose sign it rules, bitmask (bit 0 = 1st house)
+    Lagna_Lord           lord of the Lagna
+    Lagna_AspectedBy     planets aspecting the Lagna, bitmask over PLANETS
+    Conjunctions         the conjunction groups as text, e.g. "Mars+Ketu, Sun+Venus"
+    ConfigHash           canonical hash of the Lagna and the placements (-1 when none)
+
+ConfigHash is exact rather than a digest: the Lagna and each planet's sign
+(or "not placed") as digits of one integer, so two rows share it exactly
+when they have the same Lagna and place the same planets in the same
+signs, whatever Khandam or CSV they come from.
+
+The store computes them at build time into features.arrow, row for row
+alongside charts.arrow, so queries and filters read them instead of
+working them out per row.
+"""
+
+import numpy as np
+import pandas as pd
+
+from eswaranadi.khandams import PLANETS, SIGNS
+
+DIGNITIES = ["exalted", "own", "friendly", "neutral", "enemy", "debilitated"]
+HOUSE_GROUPS = {
+    "kendra": [1, 4, 7, 10],
+    "trikona": [1, 5, 9],
+    "dusthana": [6, 8, 12],
+    "upachaya": [3, 6, 10, 11],
+}
+
+# Sign -> its lord
+LORDS = dict(zip(SIGNS, [
+    "Mars", "Venus", "Mercury", "Moon", "Sun", "Mercury",
+    "Venus", "Mars", "Jupiter", "Saturn", "Saturn", "Jupiter",
+]))
+EXALTATION = {
+    "Sun": "Aries", "Moon": "Taurus", "Mars": "Capricorn", "Mercury": "Virgo", "Jupiter": "Cancer",
+    "Venus": "Pisces", "Saturn": "Libra", "Rahu": "Taurus", "Ketu": "Scorpio",
+}
+# Natural friends and enemies; every other planet is neutral. Rahu and Ketu
+# own no sign and have no natural relationships here.
+FRIENDS = {
+    "Sun": ["Moon", "Mars", "Jupiter"],
+    "Moon": ["Sun", "Mercury"],
+    "Mars": ["Sun", "Moon", "Jupiter"],
+    "Mercury": ["Sun", "Venus"],
+    "Jupiter": ["Sun", "Moon", "Mars"],
+    "Venus": ["Mercury", "Saturn"],
+    "Saturn": ["Mercury", "Venus"],
+}
+ENEMIES = {
+    "Sun": ["Venus", "Saturn"],
+    "Mars": ["Mercury"],
+    "Mercury": ["Moon"],
+    "Jupiter": ["Mercury", "Venus"],
+    "Venus": ["Sun", "Moon"],
+    "Saturn": ["Sun", "Moon", "Mars"],
+}
+# Houses counted from the planet that its full aspect falls on: every planet
+# aspects the 7th, Mars, Jupiter and Saturn have their special aspects, and
+# the nodes are given Jupiter's 5th and 9th as is usual in South India.
+ASPECTS = {planet: [7] for planet in PLANETS}
+ASPECTS.update({"Mars": [4, 7, 8], "Jupiter": [5, 7, 9], "Saturn": [3, 7, 10], "Rahu": [5, 7, 9], "Ketu": [5, 7, 9]})
+
+COLUMNS = (
+    [f"{planet}_{name}" for planet in PLANETS for name in ["House", "Dignity", "Dispositor", "Conjunct", "AspectedBy", "Lords"]]
+    + ["Lagna_Lord", "Lagna_AspectedBy", "Conjunctions", "ConfigHash"]
+)
+
+_BITS = np.left_shift(1, np.arange(len(PLANETS)))
+_LORD_CODES = np.array([PLANETS.index(LORDS[sign]) for sign in SIGNS])
+# _DRISHTI[p, d]: planet p aspects the sign d signs on from its own
+_DRISHTI = np.zeros((len(PLANETS), len(SIGNS)), dtype=bool)
+for _p, _planet in enumerate(PLANETS):
+    _DRISHTI[_p, [house - 1 for house in ASPECTS[_planet]]] = True
+
+
+def _dignity(planet, sign):
+    exalted = SIGNS.index(EXALTATION[planet])
+    if SIGNS.index(sign) == exalted:
+        return "exalted"
+    if SIGNS.index(sign) == (exalted + 6) % len(SIGNS):
+        return "debilitated"
+    lord = LORDS[sign]
+    if lord == planet:
+        return "own"
+    if lord in FRIENDS.get(planet, []):
+        return "friendly"
+    if lord in ENEMIES.get(planet, []):
+        return "enemy"
+    return "neutral"
+
+
+# _DIGNITY[p, s]: DIGNITIES code of planet p in sign s
+_DIGNITY = np.array([[DIGNITIES.index(_dignity(planet, sign)) for sign in SIGNS] for planet in PLANETS])
+
+
+def mask_names(mask, names=PLANETS):
+    """Names of the set bits of a bitmask."""
+    return [name for i, name in enumerate(names) if int(mask) >> i & 1]
+
+
+def sign_codes(charts):
+    """(rows, 9) sign codes of the planet columns (-1 when not placed) and the Lagna codes."""
+    codes = np.stack([charts[planet].cat.codes.to_numpy() for planet in PLANETS], axis=1).astype(np.int64)
+    return codes, charts["Lagna"].cat.codes.to_numpy().astype(np.int64)
+
+
+def config_hash(codes, lagna):
+    """ConfigHash of rows of sign codes and Lagna codes (see sign_codes)."""
+    # Mixed radix: the Lagna, then per planet 0 (not placed) or 1 + its sign code
+    hashes = lagna.astype(np.int64)
+    for p in range(codes.shape[1]):
+        hashes = hashes * (len(SIGNS) + 1) + codes[:, p] + 1
+    return np.where((codes >= 0).any(axis=1), hashes, -1)
+
+
+def row_hash(row):
+    """ConfigHash of one chart row given as a dict of sign names."""
+    codes = np.array([[SIGNS.index(row.get(p)) if row.get(p) in SIGNS else -1 for p in PLANETS]])
+    lagna = np.array([SIGNS.index(row["Lagna"])])
+    return int(config_hash(codes, lagna)[0])
+
+
+def _categorical(codes, categories):
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+
+def derive(charts):
+    """Derived feature columns of a chart table, one row per chart row."""
+    codes, lagna = sign_codes(charts)
+    rows, n = codes.shape
+    planets = np.arange(n)
+    placed = codes >= 0
+    both = placed[:, :, None] & placed[:, None, :] & ~np.eye(n, dtype=bool)
+
+    house = np.where(placed, (codes - lagna[:, None]) % 12 + 1, 0)
+    same = both & (codes[:, :, None] == codes[:, None, :])
+    conjunct = (same * _BITS).sum(axis=2)
+    # aspects[r, p, q]: planet p aspects planet q in row r
+    distance = (codes[:, None, :] - codes[:, :, None]) % 12
+    aspects = both & _DRISHTI[planets[None, :, None], distance]
+    aspected_by = (aspects * _BITS[None, :, None]).sum(axis=1)
+    to_lagna = (lagna[:, None] - codes) % 12
+    lagna_aspected_by = ((placed & _DRISHTI[planets[None, :], to_lagna]) * _BITS).sum(axis=1)
+    # lords[r, p]: houses (from this row's Lagna) of the signs planet p rules
+    house_bits = np.left_shift(1, (np.arange(len(SIGNS))[None, :] - lagna[:, None]) % 12)
+    rules = _LORD_CODES[None, :, None] == planets[None, None, :]
+    lords = (rules * house_bits[:, :, None]).sum(axis=1)
+    safe = np.where(placed, codes, 0)
+    dignity = np.where(placed, _DIGNITY[planets[None, :], safe], -1)
+    dispositor = np.where(placed, _LORD_CODES[safe], -1)
+
+    columns = {}
+    for p, planet in enumerate(PLANETS):
+        columns[f"{planet}_House"] = house[:, p].astype(np.int8)
+        columns[f"{planet}_Dignity"] = _categorical(dignity[:, p], DIGNITIES)
+        columns[f"{planet}_Dispositor"] = _categorical(dispositor[:, p], PLANETS)
+        columns[f"{planet}_Conjunct"] = conjunct[:, p].astype(np.uint16)
+        columns[f"{planet}_AspectedBy"] = aspected_by[:, p].astype(np.uint16)
+        columns[f"{planet}_Lords"] = lords[:, p].astype(np.uint16)
+    columns["Lagna_Lord"] = _categorical(_LORD_CODES[lagna], PLANETS)
+    columns["Lagna_AspectedBy"] = lagna_aspected_by.astype(np.uint16)
+    columns["Conjunctions"] = _groups(codes, conjunct)
+    columns["ConfigHash"] = config_hash(codes, lagna)
+    return pd.DataFrame(columns, columns=COLUMNS, index=range(rows))
+
+
+def _groups(codes, conjunct):
+    # Rows with a conjunction are the minority: only those get a Python loop
+    groups = np.full(len(codes), "", dtype=object)
+    for r in np.flatnonzero(conjunct.any(axis=1)):
+        seen, parts = set(), []
+        for p in np.flatnonzero(conjunct[r]):
+            if codes[r, p] not in seen:
+                seen.add(codes[r, p])
+                parts.append("+".join(mask_names(conjunct[r, p] | _BITS[p])))
+        groups[r] = ", ".join(parts)
+    return groups
@@ -0,0 +1,351 @@
+"""Local chart images in several sizes.
+
+`python -m eswaranadi.images` reads every ImagePath in the chart CSVs and
+writes a thumbnail and a display-size variant of each image to
+build/images/, named after a hash of the source file's contents so an
+unchanged image is never re-encoded. Encoding runs in a process pool.
+manifest.json maps each ImagePath to its variant files.
+
+At runtime `image_bytes` serves a variant from disk through a byte-bounded
+in-memory LRU. The "full" variant is the original file and is only read
+when asked for; without a built manifest every variant falls back to it.
+
+`python -m eswaranadi.images --pack` also consolidates each Khandam's
+images (every variant and the original) into one pack file,
+build/images/packs/<Khandam>.pack: an 8-byte magic, the length of a JSON
+index, the index (ImagePath -> variant -> [offset into the data, length,
+hash, content type]) and the image bytes, each distinct file once. Packing
+checks that every ImagePath in the chart CSVs resolves to a file and lists
+the ones that do not (--strict fails on them). When packs exist,
+`image_view` returns an image as a memoryview slice of the memory-mapped
+pack, without opening, reading or copying anything, and `image_bytes`
+reads through it.
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import mimetypes
+import mmap
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, features
+
+from eswaranadi import metrics, store
+from eswaranadi.khandams import KHANDAMS, available, path
+
+IMAGE_DIR = path("build/images")
+MANIFEST = "manifest.json"
+PACK_DIR = path("build/images/packs")
+PACK_MAGIC = b"ENIMGPK1"
+PACK_EXT = ".pack"
+
+# Variant name -> longest side in pixels
+VARIANTS = {"thumb": 200, "display": 640}
+QUALITY = 80
+CACHE_BYTES = 64 * 1024 * 1024
+
+
+def _format():
+    return ("WEBP", "webp") if features.check("webp") else ("JPEG", "jpg")
+
+
+# Building
+def _encode_variants(job):
+    image_path, out_dir = job
+    source = path(image_path)
+    if not os.path.isfile(source):
+        return image_path, None
+    with open(source, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    fmt, ext = _format()
+    entry = {"hash": digest}
+    image = None
+    for name, side in VARIANTS.items():
+        filename = f"{digest}-{name}.{ext}"
+        entry[name] = filename
+        target = os.path.join(out_dir, filename)
+        if os.path.exists(target):
+            continue
+        if image is None:
+            image = Image.open(io.BytesIO(data)).convert("RGB")
+        variant = image.copy()
+        variant.thumbnail((side, side), Image.LANCZOS)
+        tmp = f"{target}.tmp"
+        variant.save(tmp, fmt, quality=QUALITY)
+        os.replace(tmp, target)
+    return image_path, entry
+
+
+def image_paths(khandams=None):
+    """Distinct non-empty ImagePath values of the given Khandams' charts."""
+    paths = []
+    for khandam in khandams or available():
+        paths += [p for p in store.load_charts(khandam)["ImagePath"] if isinstance(p, str) and p]
+    return list(dict.fromkeys(paths))
+
+
+def build(out_dir=IMAGE_DIR, khandams=None, workers=None):
+    """Encode the variants of every chart image; returns (manifest, missing ImagePaths)."""
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = [(image_path, out_dir) for image_path in image_paths(khandams)]
+    manifest, missing = {}, []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for image_path, entry in pool.map(_encode_variants, jobs, chunksize=16):
+            if entry is None:
+                missing.append(image_path)
+            else:
+                manifest[image_path] = entry
+
+    tmp = os.path.join(out_dir, f"{MANIFEST}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, os.path.join(out_dir, MANIFEST))
+    return manifest, missing
+
+
+# Serving
+class ByteLRU:
+    """Thread-safe LRU of bytes values, bounded by their total size."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._items[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+
+_cache = ByteLRU(CACHE_BYTES)
+_manifest = {}
+
+
+def _load_manifest(image_dir):
+    manifest_path = os.path.join(image_dir, MANIFEST)
+    try:
+        stamp = os.stat(manifest_path).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    cached = _manifest.get(image_dir)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    _manifest[image_dir] = (stamp, manifest)
+    return manifest
+
+
+def variant_file(image_path, variant="display", image_dir=IMAGE_DIR):
+    """On-disk file for a variant of an ImagePath; the original for "full" or when not built."""
+    entry = _load_manifest(image_dir).get(image_path)
+    if variant != "full" and entry and variant in entry:
+        return os.path.join(image_dir, entry[variant])
+    return path(image_path)
+
+
+class ImagePack:
+    """A memory-mapped pack file; images are memoryview slices of the mapping."""
+
+    def __init__(self, filename):
+        with open(filename, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        header = len(PACK_MAGIC) + 8
+        if self._view[:len(PACK_MAGIC)] != PACK_MAGIC:
+            raise ValueError(f"{filename}: not an image pack")
+        length = int.from_bytes(self._view[len(PACK_MAGIC):header], "little")
+        self.index = json.loads(bytes(self._view[header:header + length]))
+        self._data = self._view[header + length:]
+
+    def get(self, image_path, variant="display"):
+        """(memoryview, hash, content type) of a variant, the original when it is not packed; None when absent."""
+        entry = self.index.get(image_path)
+        if entry is None:
+            return None
+        offset, length, digest, content_type = entry.get(variant) or entry["full"]
+        return self._data[offset:offset + length], digest, content_type
+
+
+_packs = {}
+
+
+def _load_packs(pack_dir):
+    """{ImagePath: ImagePack} over the pack files, reopened when the directory changes."""
+    try:
+        stamp = os.stat(pack_dir).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    cached = _packs.get(pack_dir)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    # Replaced packs are unmapped once no slice of them is referenced any more
+    by_path = {}
+    for name in sorted(os.listdir(pack_dir)):
+        if name.endswith(PACK_EXT):
+            pack = ImagePack(os.path.join(pack_dir, name))
+            for image_path in pack.index:
+                by_path.setdefault(image_path, pack)
+    _packs[pack_dir] = (stamp, by_path)
+    return by_path
+
+
+def packed_image(image_path, variant="display", pack_dir=PACK_DIR):
+    """(memoryview, hash, content type) of a packed image variant, or None when it is not packed."""
+    pack = _load_packs(pack_dir).get(image_path)
+    return pack.get(image_path, variant) if pack else None
+
+
+def _file_bytes(image_path, variant, image_dir):
+    filename = variant_file(image_path, variant, image_dir)
+    data = _cache.get(filename)
+    cache = "hit"
+    if data is None:
+        cache = "miss"
+        try:
+            with open(filename, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None, cache
+        _cache.put(filename, data)
+        metrics.count("image_read_bytes_total", len(data), variant=variant)
+    return data, cache
+
+
+def image_view(image_path, variant="display", image_dir=IMAGE_DIR, pack_dir=PACK_DIR):
+    """A chart image variant as a memoryview, or None when the image does not exist.
+
+    Packed images are zero-copy slices of their pack; others are read
+    through the in-memory LRU.
+    """
+    start = time.perf_counter()
+    packed = packed_image(image_path, variant, pack_dir)
+    if packed is not None:
+        view, cache = packed[0], "pack"
+    else:
+        data, cache = _file_bytes(image_path, variant, image_dir)
+        if data is None:
+            return None
+        view = memoryview(data)
+    metrics.observe("image_fetch_seconds", time.perf_counter() - start, variant=variant, cache=cache)
+    return view
+
+
+def image_bytes(image_path, variant="display", image_dir=IMAGE_DIR, pack_dir=PACK_DIR):
+    """Encoded bytes of a chart image variant, or None when the image does not exist.
+
+    For callers that need bytes (st.image does): a packed image is copied
+    out of its pack once, an unpacked one is the cached bytes themselves.
+    """
+    view = image_view(image_path, variant, image_dir, pack_dir)
+    if view is None:
+        return None
+    return view.obj if isinstance(view.obj, bytes) else bytes(view)
+
+
+# Packing
+def _pack_files(khandam, image_dir):
+    """({ImagePath: {variant: file}}, missing ImagePaths) of one Khandam's chart images."""
+    manifest = _load_manifest(image_dir)
+    files, missing = {}, []
+    for image_path in image_paths([khandam]):
+        source = path(image_path)
+        if not os.path.isfile(source):
+            missing.append(image_path)
+            continue
+        files[image_path] = {"full": source}
+        for name in VARIANTS:
+            if name in manifest.get(image_path, {}):
+                files[image_path][name] = os.path.join(image_dir, manifest[image_path][name])
+    return files, missing
+
+
+def build_pack(khandam, pack_dir=PACK_DIR, image_dir=IMAGE_DIR):
+    """Write one Khandam's pack; returns (packed ImagePaths, missing ImagePaths, written)."""
+    files, missing = _pack_files(khandam, image_dir)
+    # Identical files (the same image under two ImagePaths) are stored once
+    index, blobs, offsets, size = {}, [], {}, 0
+    for image_path, variants in files.items():
+        index[image_path] = {}
+        for name, filename in variants.items():
+            with open(filename, "rb") as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()[:16]
+            if digest not in offsets:
+                offsets[digest] = size
+                blobs.append(data)
+                size += len(data)
+            content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            index[image_path][name] = [offsets[digest], len(data), digest, content_type]
+
+    target = os.path.join(pack_dir, khandam + PACK_EXT)
+    if os.path.exists(target) and ImagePack(target).index == index:
+        return len(files), missing, False
+    os.makedirs(pack_dir, exist_ok=True)
+    encoded = json.dumps(index, separators=(",", ":")).encode("utf-8")
+    tmp = f"{target}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(PACK_MAGIC)
+        f.write(len(encoded).to_bytes(8, "little"))
+        f.write(encoded)
+        for data in blobs:
+            f.write(data)
+    os.replace(tmp, target)
+    return len(files), missing, True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build thumbnail and display variants of the chart images.")
+    parser.add_argument("--out", default=IMAGE_DIR, help="output directory (default: build/images)")
+    parser.add_argument("--workers", type=int, default=None, help="encoder processes (default: CPU count)")
+    parser.add_argument("--pack", action="store_true", help="also write one pack file per Khandam")
+    parser.add_argument("--strict", action="store_true", help="fail when an ImagePath does not resolve")
+    parser.add_argument("khandams", nargs="*", help="Khandams to process (default: all)")
+    args = parser.parse_args(argv)
+    unknown = set(args.khandams) - set(KHANDAMS)
+    if unknown:
+        parser.error(f"unknown Khandam: {', '.join(sorted(unknown))}")
+    manifest, missing = build(args.out, args.khandams or None, args.workers)
+    print(f"{len(manifest)} images, {len(missing)} missing")
+    for image_path in missing:
+        print(f"  missing: {image_path}")
+    if args.pack:
+        for khandam in args.khandams or available():
+            packed, unresolved, written = build_pack(khandam, os.path.join(args.out, "packs"), args.out)
+            state = "written" if written else "unchanged"
+            print(f"{khandam}: {packed} images packed ({state}), {len(unresolved)} ImagePaths unresolved")
+    if args.strict and missing:
+        raise SystemExit(f"{len(missing)} ImagePaths do not resolve")
+
+
+if __name__ == "__main__":
+    main()
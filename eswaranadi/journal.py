@@ -0,0 +1,280 @@
+"""Append-only journal of verse edits.
+
+Saving a verse appends one JSON line to the Khandam's verse_edits.jsonl
+instead of rewriting its *_Verses_{lagna}.csv, so a save costs one small
+append and fsync. Appends and compaction hold an exclusive lock on
+verse_edits.lock, which serialises writers across sessions and processes.
+
+Every verse has a version: a short hash of its Tamil and English text.
+An edit records the version it was made against, and `save` raises
+ConflictError when the verse has changed since then, instead of silently
+overwriting the other edit.
+
+Each process tails the journal and keeps the latest entry of every edited
+verse in memory. `overlay` applies that entry to a verse record read from
+the (cached) store, so a save invalidates exactly one
+(Khandam, Lagna, VerseID) and the cached Lagna data stays valid.
+
+Compaction (`python -m eswaranadi.journal compact`, and automatically after
+COMPACT_AFTER appends) writes the latest text into the verse CSVs with
+atomic replaces, then rewrites the journal down to one compacted entry per
+edited verse. Those entries keep conflict detection exact after compaction.
+Both then recompile that Khandam into the corpus store, if there is one:
+the rewritten CSVs would otherwise make the store stale and send every
+loader of the Khandam back to parsing CSVs. The automatic compaction and
+recompile run on a background thread, so a save still only appends.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+from eswaranadi import metrics, store
+from eswaranadi.khandams import KHANDAMS, available, path
+
+try:
+    import fcntl
+except ImportError:  # Windows: sessions of one process are still serialised
+    fcntl = None
+
+JOURNAL = "verse_edits.jsonl"
+LOCK = "verse_edits.lock"
+COMPACT_AFTER = 200
+
+
+class ConflictError(Exception):
+    """The verse changed after the editor loaded it; `current` is the newer entry."""
+
+    def __init__(self, current):
+        super().__init__(f"Verse {current['VerseID']} was changed by another edit")
+        self.current = current
+
+
+def verse_version(tamil, english):
+    return hashlib.sha1(f"{tamil}\x1f{english}".encode("utf-8")).hexdigest()[:12]
+
+
+def journal_path(khandam):
+    return path(os.path.join(KHANDAMS[khandam].folder, JOURNAL))
+
+
+# Tailing
+class _Tail:
+    def __init__(self, inode=None):
+        self.inode = inode
+        self.offset = 0
+        self.appended = 0
+        self.latest = {}
+
+
+_tails = {}
+_thread_lock = threading.Lock()
+
+
+def _refresh(khandam):
+    """Read journal lines appended since the last call; start over if the file was replaced."""
+    filename = journal_path(khandam)
+    try:
+        st = os.stat(filename)
+    except FileNotFoundError:
+        _tails[khandam] = _Tail()
+        return _tails[khandam]
+    tail = _tails.get(khandam)
+    if tail is None or tail.inode != st.st_ino or st.st_size < tail.offset:
+        tail = _tails[khandam] = _Tail(st.st_ino)
+    if st.st_size > tail.offset:
+        with open(filename, "rb") as f:
+            f.seek(tail.offset)
+            data = f.read(st.st_size - tail.offset)
+        # Only whole lines; a line still being written is picked up next time
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            if line.strip():
+                entry = json.loads(line)
+                tail.latest[(entry["Lagna"], entry["VerseID"])] = entry
+                if not entry.get("compacted"):
+                    tail.appended += 1
+        tail.offset += end
+    return tail
+
+
+def edits(khandam):
+    """(Lagna, VerseID) -> latest journal entry of every edited verse."""
+    with _thread_lock:
+        return dict(_refresh(khandam).latest)
+
+
+def overlay(khandam, verse):
+    """The verse record with its latest journaled edit applied."""
+    if verse is None:
+        return None
+    with _thread_lock:
+        entry = _refresh(khandam).latest.get((verse.get("Lagna"), verse.get("VerseID")))
+    if entry is None:
+        return verse
+    return {**verse, "TamilVerse": entry["TamilVerse"], "EnglishTranslation": entry["EnglishTranslation"]}
+
+
+_write_lock = threading.Lock()
+
+
+@contextmanager
+def _locked(khandam):
+    # Writers of this process queue on _write_lock and other processes on the
+    # file lock; _thread_lock is only held to read the journal, so overlay()
+    # and edits() never wait for another process's compaction
+    with _write_lock:
+        lock_path = path(os.path.join(KHANDAMS[khandam].folder, LOCK))
+        with open(lock_path, "a") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with _thread_lock:
+                    tail = _refresh(khandam)
+                yield tail
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _append(khandam, entry):
+    line = json.dumps(entry, ensure_ascii=False).encode("utf-8") + b"\n"
+    with metrics.timer("journal_append_seconds", khandam=khandam):
+        with open(journal_path(khandam), "ab") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+    metrics.count("journal_append_bytes_total", len(line), khandam=khandam)
+
+
+def save(khandam, lagna, verse_id, tamil, english, base_version):
+    """Journal an edit made against `base_version`; returns the new version.
+
+    Raises ConflictError when the verse's latest journaled version is not
+    `base_version`. A verse with no journal entry still has its CSV text,
+    which is what the editor was loaded from.
+    """
+    with metrics.timer("verse_save_seconds", khandam=khandam), _locked(khandam) as tail:
+        current = tail.latest.get((lagna, verse_id))
+        if current is not None and current["version"] != base_version:
+            raise ConflictError(current)
+        entry = {
+            "Lagna": lagna,
+            "VerseID": verse_id,
+            "TamilVerse": tamil,
+            "EnglishTranslation": english,
+            "version": verse_version(tamil, english),
+            "base": base_version,
+            "time": time.time(),
+        }
+        _append(khandam, entry)
+        if tail.appended + 1 >= COMPACT_AFTER:
+            _compact_in_background(khandam)
+        return entry["version"]
+
+
+# Compaction
+def _write_verse_csv(filename, updates):
+    with open(filename, "rb") as f:
+        raw = f.read()
+    bom = raw.startswith(b"\xef\xbb\xbf")
+    newline = "\r\n" if b"\r\n" in raw[:4096] else "\n"
+    df = pd.read_csv(filename, encoding="utf-8-sig", dtype=str, keep_default_na=False)
+    ids = df["VerseID"].str.strip()
+    for verse_id, entry in updates.items():
+        rows = ids == verse_id
+        df.loc[rows, "TamilVerse"] = entry["TamilVerse"]
+        df.loc[rows, "EnglishTranslation"] = entry["EnglishTranslation"]
+    tmp = f"{filename}.tmp"
+    df.to_csv(tmp, index=False, encoding="utf-8-sig" if bom else "utf-8", lineterminator=newline)
+    os.replace(tmp, filename)
+
+
+def _compact(khandam):
+    with _thread_lock:
+        latest = dict(_refresh(khandam).latest)
+    pending = {}
+    for (lagna, verse_id), entry in latest.items():
+        if not entry.get("compacted"):
+            pending.setdefault(lagna, {})[verse_id] = entry
+    for lagna, updates in pending.items():
+        _write_verse_csv(path(KHANDAMS[khandam].verse_csv.format(lagna=lagna)), updates)
+
+    # Keep one entry per edited verse so versions survive the compaction
+    filename = journal_path(khandam)
+    tmp = f"{filename}.tmp"
+    with open(tmp, "wb") as f:
+        for entry in latest.values():
+            line = {**entry, "compacted": True}
+            f.write(json.dumps(line, ensure_ascii=False).encode("utf-8") + b"\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, filename)
+    with _thread_lock:
+        _refresh(khandam)
+    return sum(len(updates) for updates in pending.values())
+
+
+def update_store(khandam):
+    """Recompile a Khandam into the corpus store after compaction rewrote its CSVs; False without a store."""
+    with metrics.timer("journal_store_update_seconds", khandam=khandam):
+        return store.update(khandam) is not None
+
+
+_compacting = set()
+_compacting_lock = threading.Lock()
+
+
+def _compact_in_background(khandam):
+    # One compaction per Khandam at a time; the thread takes the journal lock itself
+    with _compacting_lock:
+        if khandam in _compacting:
+            return
+        _compacting.add(khandam)
+
+    def run():
+        try:
+            if compact(khandam):
+                update_store(khandam)
+        finally:
+            with _compacting_lock:
+                _compacting.discard(khandam)
+    threading.Thread(target=run, name=f"compact-{khandam}", daemon=True).start()
+
+
+def compact(khandam):
+    """Fold pending journal entries into the verse CSVs; returns the number of verses written."""
+    with _locked(khandam), metrics.timer("journal_compact_seconds", khandam=khandam):
+        return _compact(khandam)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verse edit journal maintenance.")
+    parser.add_argument("command", choices=["status", "compact"])
+    parser.add_argument("khandams", nargs="*", help="Khandams (default: all)")
+    parser.add_argument("--no-store", action="store_true", help="do not update the corpus store after compacting")
+    args = parser.parse_args(argv)
+    unknown = set(args.khandams) - set(KHANDAMS)
+    if unknown:
+        parser.error(f"unknown Khandam: {', '.join(sorted(unknown))}")
+
+    for khandam in args.khandams or available():
+        if args.command == "compact":
+            count = compact(khandam)
+            print(f"{khandam}: {count} verses compacted")
+            if count and not args.no_store and update_store(khandam):
+                print(f"{khandam}: corpus store updated")
+        else:
+            with _thread_lock:
+                tail = _refresh(khandam)
+            print(f"{khandam}: {len(tail.latest)} edited verses, {tail.appended} pending entries")
+
+
+if __name__ == "__main__":
+    main()
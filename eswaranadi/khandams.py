@@ -0,0 +1,89 @@
+"""Registry of the Khandams and the files that make up each one."""
+
+import json
+import os
+from collections import namedtuple
+
+# Repository root; every path below and every ImagePath in the CSVs is relative to it.
+# ESWARANADI_ROOT points the package at another corpus laid out the same way
+# (e.g. one from python -m eswaranadi.synthetic) whose khandams.json lists its Khandams.
+ROOT = os.environ.get("ESWARANADI_ROOT") or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REGISTRY = "khandams.json"
+
+# Lagna order
+SIGNS = [
+    "Aries", "Taurus", "Gemini", "Cancer", "Leo", "Virgo",
+    "Libra", "Scorpio", "Sagittarius", "Capricorn", "Aquarius", "Pisces"
+]
+
+PLANETS = ["Sun", "Moon", "Mars", "Mercury", "Jupiter", "Venus", "Saturn", "Rahu", "Ketu"]
+
+Khandam = namedtuple(
+    "Khandam",
+    ["name", "title", "folder", "chart_csv", "verse_csv", "interpretation_csv", "image_dir"],
+)
+
+KHANDAMS = {
+    "Surya": Khandam(
+        name="Surya",
+        title="Surya Khandam",
+        folder="SuryaKhandam",
+        chart_csv="SuryaKhandam/EswaraNadi_SuryaKhandam.csv",
+        verse_csv="SuryaKhandam/Surya_Verses_{lagna}.csv",
+        interpretation_csv="SuryaKhandam/SuryaKhandam_Interpretations.csv",
+        image_dir="SuryaKhandam/images",
+    ),
+    "Chandra": Khandam(
+        name="Chandra",
+        title="Chandra Khandam",
+        folder="Chandra_Khandam",
+        chart_csv="Chandra_Khandam/Chandra_Khandam.csv",
+        verse_csv="Chandra_Khandam/Chandra_Verses_{lagna}.csv",
+        interpretation_csv=None,
+        image_dir="Chandra_Khandam/images",
+    ),
+    "Kuja": Khandam(
+        name="Kuja",
+        title="Kuja(Mars) Khandam",
+        folder="Kuja_Khandam",
+        chart_csv="Kuja_Khandam/Kuja_Khandam.csv",
+        verse_csv="Kuja_Khandam/Kuja_Verses_{lagna}.csv",
+        interpretation_csv=None,
+        image_dir="Kuja_Khandam/images",
+    ),
+}
+
+# The remaining Khandams, not digitized yet: their files appear at these paths
+for _name in ["Budha", "Guru", "Sukra", "Sani"]:
+    KHANDAMS[_name] = Khandam(
+        name=_name,
+        title=f"{_name} Khandam",
+        folder=f"{_name}_Khandam",
+        chart_csv=f"{_name}_Khandam/{_name}_Khandam.csv",
+        verse_csv=f"{_name}_Khandam/{_name}_Verses_{{lagna}}.csv",
+        interpretation_csv=None,
+        image_dir=f"{_name}_Khandam/images",
+    )
+
+if os.environ.get("ESWARANADI_ROOT") and os.path.exists(os.path.join(ROOT, REGISTRY)):
+    with open(os.path.join(ROOT, REGISTRY), encoding="utf-8") as f:
+        KHANDAMS = {entry["name"]: Khandam(**entry) for entry in json.load(f)}
+
+
+def path(relpath):
+    return os.path.join(ROOT, relpath)
+
+
+def available():
+    """Names of the Khandams whose chart CSV exists, in registry order."""
+    return [name for name, k in KHANDAMS.items() if os.path.exists(path(k.chart_csv))]
+
+
+def source_files(khandam):
+    """Every CSV a Khandam is compiled from, as repo-relative paths that exist."""
+    k = KHANDAMS[khandam]
+    files = [k.chart_csv]
+    files += [k.verse_csv.format(lagna=lagna) for lagna in SIGNS]
+    if k.interpretation_csv:
+        files.append(k.interpretation_csv)
+    return [f for f in files if os.path.exists(path(f))]
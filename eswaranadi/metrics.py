@@ -0,0 +1,206 @@
+"""Timings and counters of the apps' hot paths.
+
+Library code records with `timer(name, **labels)`, `observe` and `count`.
+Every measurement goes to the process-wide registry PROCESS and, when an
+app has bound its session's registry to the running script thread
+(`bind`), to that session's registry too. Timers keep a count, a sum, a
+maximum and Prometheus histogram buckets; counters keep a total.
+
+`cached(name)` wraps a cached loader (`st.cache_resource`, or a cache of
+its own such as the Lagna cache) and counts its calls as hits or misses;
+the loader calls `cache_miss()` only when it actually loads.
+
+With ESWARANADI_METRICS set to a file name, `export()` writes the process
+registry there at most every EXPORT_INTERVAL seconds: Prometheus text
+format, or JSON when the name ends in .json. "{pid}" in the name is
+replaced with the process id, for one file per server process.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+PREFIX = "eswaranadi_"
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+EXPORT_ENV = "ESWARANADI_METRICS"
+EXPORT_INTERVAL = 5.0
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+class Registry:
+    """Thread-safe timers and counters, keyed by name and labels."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.timers = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds, labels):
+        key = _key(name, labels)
+        with self._lock:
+            timer = self.timers.get(key)
+            if timer is None:
+                timer = self.timers[key] = {"count": 0, "sum": 0.0, "max": 0.0, "buckets": [0] * len(BUCKETS)}
+            timer["count"] += 1
+            timer["sum"] += seconds
+            timer["max"] = max(timer["max"], seconds)
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    timer["buckets"][i] += 1
+
+    def count(self, name, n, labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def rows(self):
+        """One dict per timer and counter, for display."""
+        with self._lock:
+            timers = [(key, dict(value)) for key, value in self.timers.items()]
+            counters = list(self.counters.items())
+        rows = []
+        for (name, labels), timer in sorted(timers):
+            rows.append({
+                "metric": name,
+                "labels": ", ".join(f"{k}={v}" for k, v in labels),
+                "count": timer["count"],
+                "total ms": round(timer["sum"] * 1000, 1),
+                "mean ms": round(timer["sum"] * 1000 / timer["count"], 2),
+                "max ms": round(timer["max"] * 1000, 2),
+            })
+        for (name, labels), value in sorted(counters):
+            rows.append({"metric": name, "labels": ", ".join(f"{k}={v}" for k, v in labels), "count": value})
+        return rows
+
+    def to_json(self):
+        with self._lock:
+            return json.dumps({
+                "pid": os.getpid(),
+                "started": self.started,
+                "time": time.time(),
+                "timers": [
+                    {"name": name, "labels": dict(labels), **value}
+                    for (name, labels), value in sorted(self.timers.items())
+                ],
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self.counters.items())
+                ],
+                "buckets": BUCKETS,
+            }, indent=1)
+
+    def to_prometheus(self):
+        lines = []
+        with self._lock:
+            timers = sorted(self.timers.items())
+            counters = sorted(self.counters.items())
+        typed = set()
+        for (name, labels), timer in timers:
+            metric = PREFIX + name
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            for bound, n in zip(BUCKETS, timer["buckets"]):
+                lines.append(f"{metric}_bucket{_labels(labels, [('le', bound)])} {n}")
+            lines.append(f"{metric}_bucket{_labels(labels, [('le', '+Inf')])} {timer['count']}")
+            lines.append(f"{metric}_sum{_labels(labels)} {timer['sum']:.6f}")
+            lines.append(f"{metric}_count{_labels(labels)} {timer['count']}")
+        for (name, labels), value in counters:
+            metric = PREFIX + name
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+PROCESS = Registry()
+_local = threading.local()
+
+
+def bind(registry):
+    """Also record this thread's measurements in `registry` (a session's), or stop with None."""
+    _local.session = registry
+
+
+def _registries():
+    session = getattr(_local, "session", None)
+    return (PROCESS, session) if session is not None else (PROCESS,)
+
+
+def observe(name, seconds, **labels):
+    for registry in _registries():
+        registry.observe(name, seconds, labels)
+
+
+def count(name, n=1, **labels):
+    for registry in _registries():
+        registry.count(name, n, labels)
+
+
+@contextmanager
+def timer(name, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def cache_miss():
+    """Called by a `cached` loader when it actually loads, i.e. on a cache miss."""
+    _local.miss = True
+
+
+def cached(name):
+    """Count and time the calls of a cached loader (e.g. st.cache_resource) as cache hits or misses."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def call(*args, **kwargs):
+            _local.miss = False
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                result = "miss" if _local.miss else "hit"
+                observe("cache_seconds", time.perf_counter() - start, cache=name, result=result)
+                count("cache_requests_total", cache=name, result=result)
+        return call
+    return decorate
+
+
+_exported = {"time": 0.0}
+_export_lock = threading.Lock()
+
+
+def export(filename=None, force=False):
+    """Write the process registry to `filename` (default: $ESWARANADI_METRICS), throttled."""
+    filename = filename or os.environ.get(EXPORT_ENV)
+    if not filename:
+        return None
+    now = time.monotonic()
+    with _export_lock:
+        if not force and now - _exported["time"] < EXPORT_INTERVAL:
+            return None
+        _exported["time"] = now
+    filename = filename.replace("{pid}", str(os.getpid()))
+    text = PROCESS.to_json() if filename.endswith(".json") else PROCESS.to_prometheus()
+    tmp = f"{filename}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, filename)
+    return filename
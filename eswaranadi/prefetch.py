@@ -0,0 +1,96 @@
+"""Background prefetch of data the user is likely to ask for next.
+
+A Prefetcher is a cache of loaded values that can also load values on a
+small thread pool before they are asked for:
+
+    prefetcher = Prefetcher(load, warm)
+    prefetcher.prefetch(key, *warm_args)   # returns at once
+    value = prefetcher.take(key)           # cached, prefetched, or load(*key) now
+
+`take` of a key still loading waits for that load instead of starting a
+second one. After loading, `warm(value, *warm_args)` runs in the same job,
+for side effects such as filling the image caches. Keys already in the
+cache are not prefetched again.
+
+Memory stays bounded: the cache is an LRU of `cache_entries` values, and
+at most `max_entries` prefetched values wait to be taken (the oldest are
+dropped first, and queued jobs for them cancelled).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from eswaranadi import metrics
+
+MAX_ENTRIES = 8
+CACHE_ENTRIES = 64
+WORKERS = 2
+
+
+class Prefetcher:
+    """An LRU of loaded values, and values loaded ahead of time on a thread pool."""
+
+    def __init__(self, load, warm=None, max_entries=MAX_ENTRIES, cache_entries=CACHE_ENTRIES, workers=WORKERS):
+        self.load = load
+        self.warm = warm
+        self.max_entries = max_entries
+        self.cache_entries = cache_entries
+        self._pending = OrderedDict()  # key -> Future of the value
+        self._cache = OrderedDict()  # key -> value taken, most recent last
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="prefetch")
+
+    def _job(self, key, warm_args):
+        with metrics.timer("prefetch_seconds"):
+            value = self.load(*key)
+            if self.warm is not None:
+                self.warm(value, *warm_args)
+        return value
+
+    def prefetch(self, key, *warm_args):
+        """Start loading `key` in the background unless it is loading, waiting or cached."""
+        with self._lock:
+            if key in self._pending or key in self._cache:
+                return
+            self._pending[key] = self._pool.submit(self._job, key, warm_args)
+            while len(self._pending) > self.max_entries:
+                _, future = self._pending.popitem(last=False)
+                future.cancel()
+                metrics.count("prefetch_requests_total", result="dropped")
+
+    def _keep(self, key, value):
+        with self._lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        return value
+
+    def take(self, key):
+        """The value of `key`: cached, prefetched, waited for, or loaded in the foreground.
+
+        Anything but a cached value counts as a miss of the `metrics.cached`
+        loader calling it.
+        """
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+            future = self._pending.pop(key, None)
+        metrics.cache_miss()
+        if future is not None and not future.cancelled():
+            result = "hit" if future.done() else "wait"
+            start = time.perf_counter()
+            try:
+                value = future.result()
+            except Exception:
+                # A failed prefetch is retried below, where its error surfaces normally
+                pass
+            else:
+                metrics.observe("prefetch_take_seconds", time.perf_counter() - start, result=result)
+                metrics.count("prefetch_requests_total", result=result)
+                return self._keep(key, value)
+        metrics.count("prefetch_requests_total", result="miss")
+        return self._keep(key, self.load(*key))
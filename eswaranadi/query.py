@@ -0,0 +1,193 @@
+"""Planetary-configuration queries over the charts of every Khandam.
+
+A query is a list of terms joined by AND, for example
+
+    Mars in Aries AND Jupiter in Libra AND Ketu conjunct Mars
+
+Supported terms:
+
+    <planet> in <sign>             Mars in Aries
+    <planet> conjunct <planet>     Ketu conjunct Mars (also "with")
+    <planet> in house <n>          Mars in house 4 (also "Mars in 4th house")
+    <planet> in <house group>      Mars in kendra (also trikona, dusthana, upachaya)
+    <planet> <dignity>             Mars in own sign, Saturn exalted, Sun debilitated,
+                                   Moon in friendly / neutral / enemy sign
+    <planet> aspected by <planet>  Mars aspected by Jupiter (also "Jupiter aspects Mars";
+                                   "Lagna aspected by Saturn")
+    Lagna <sign>                   Lagna Aries (also "Lagna is Aries")
+    Khandam <name>                 Khandam Surya (also "Khandam is Surya")
+
+so "Mars in own sign in a kendra aspected by Jupiter" is
+
+    Mars in own sign AND Mars in kendra AND Mars aspected by Jupiter
+
+Houses, dignities and aspects come from the precomputed feature columns
+(eswaranadi.features). The index keeps one bitset per (planet, sign), per
+(planet, house), per (planet, dignity), per (aspected, aspecting planet),
+per Lagna and per Khandam, packed into uint64 words with one bit per chart
+row. A query is a handful of word-wise ANDs/ORs over those bitsets, so its
+cost grows with rows / 64 rather than with a DataFrame scan.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from eswaranadi import features, store
+from eswaranadi.features import DIGNITIES, HOUSE_GROUPS
+from eswaranadi.khandams import KHANDAMS, PLANETS, SIGNS, available
+
+RESULT_COLUMNS = ["Khandam", "Lagna", "VerseID"] + PLANETS + ["Result", "ImagePath"]
+
+_NAMES = {name.lower(): name for name in PLANETS + SIGNS + list(KHANDAMS)}
+_HOUSE = re.compile(r"^(\w+)\s+in\s+(?:the\s+)?(?:house\s+(\d+)|(\d+)(?:st|nd|rd|th)?\s+house)$", re.I)
+_HOUSE_GROUP = re.compile(r"^(\w+)\s+in\s+(?:an?\s+)?(" + "|".join(HOUSE_GROUPS) + r")$", re.I)
+_DIGNITY = re.compile(
+    r"^(\w+)\s+(?:is\s+)?(?:in\s+)?(?:(exalted|debilitated)|(own|friendly|neutral|enemy)\s+sign)$", re.I
+)
+_ASPECTED = re.compile(r"^(\w+)\s+(?:is\s+)?aspected\s+by\s+(\w+)$", re.I)
+_ASPECTS = re.compile(r"^(\w+)\s+aspects\s+(\w+)$", re.I)
+_PLANET_IN = re.compile(r"^(\w+)\s+in\s+(\w+)$", re.I)
+_CONJUNCT = re.compile(r"^(\w+)\s+(?:conjunct|with)\s+(\w+)$", re.I)
+_LAGNA = re.compile(r"^lagna\s+(?:is\s+)?(\w+)$", re.I)
+_KHANDAM = re.compile(r"^khandam\s+(?:is\s+)?(\w+)$", re.I)
+
+
+def pack(onehot):
+    """(rows, ...) bool array -> (..., words) uint64 bitsets, bit i = row i."""
+    rows = onehot.shape[0]
+    padded = np.zeros((-(-rows // 64) * 64,) + onehot.shape[1:], dtype=bool)
+    padded[:rows] = onehot
+    packed = np.packbits(padded, axis=0, bitorder="little")
+    packed = np.moveaxis(packed, 0, -1)
+    return np.ascontiguousarray(packed).view(np.uint64)
+
+
+def _name(word, allowed, kind):
+    name = _NAMES.get(word.lower())
+    if name not in allowed:
+        raise ValueError(f"Unknown {kind}: {word}")
+    return name
+
+
+class ConfigIndex:
+    """Bitset index over the chart rows of the given Khandams."""
+
+    def __init__(self, charts, derived=None):
+        self.charts = charts.reset_index(drop=True)
+        self.rows = len(self.charts)
+        if derived is None:
+            derived = features.derive(self.charts)
+        codes = np.stack([self.charts[planet].cat.codes.to_numpy() for planet in PLANETS], axis=1)
+        signs = np.arange(len(SIGNS))
+        # planet_bits[p, s] is the set of rows with PLANETS[p] in SIGNS[s]
+        self.planet_bits = pack(codes[:, :, None] == signs)
+        # house_bits[p, h - 1]: PLANETS[p] in house h; dignity_bits[p, d]: PLANETS[p] with DIGNITIES[d]
+        houses = np.stack([derived[f"{planet}_House"].to_numpy() for planet in PLANETS], axis=1)
+        self.house_bits = pack(houses[:, :, None] == np.arange(1, 13))
+        dignities = np.stack([derived[f"{planet}_Dignity"].cat.codes.to_numpy() for planet in PLANETS], axis=1)
+        self.dignity_bits = pack(dignities[:, :, None] == np.arange(len(DIGNITIES)))
+        # aspect_bits[t, p]: PLANETS[p] aspects target t (the nine planets, then the Lagna)
+        aspected = np.stack(
+            [derived[f"{planet}_AspectedBy"].to_numpy() for planet in PLANETS] + [derived["Lagna_AspectedBy"].to_numpy()],
+            axis=1,
+        ).astype(np.int64)
+        self.aspect_bits = pack((aspected[:, :, None] >> np.arange(len(PLANETS)) & 1).astype(bool))
+        self.lagna_bits = pack(self.charts["Lagna"].cat.codes.to_numpy()[:, None] == signs)
+        khandam_codes = self.charts["Khandam"].cat.codes.to_numpy()
+        self.khandam_bits = pack(khandam_codes[:, None] == np.arange(len(KHANDAMS)))
+        self.all_bits = pack(np.ones((self.rows, 1), dtype=bool))[0]
+
+    def _target(self, word):
+        # Aspect targets: a planet, or the Lagna after the nine planets
+        return len(PLANETS) if word.lower() == "lagna" else PLANETS.index(_name(word, PLANETS, "planet"))
+
+    def term_bits(self, term):
+        term = " ".join(term.split())
+        m = _HOUSE.match(term)
+        if m:
+            planet = PLANETS.index(_name(m.group(1), PLANETS, "planet"))
+            house = int(m.group(2) or m.group(3))
+            if not 1 <= house <= 12:
+                raise ValueError(f"Unknown house: {house}")
+            return self.house_bits[planet, house - 1]
+        m = _HOUSE_GROUP.match(term)
+        if m:
+            planet = PLANETS.index(_name(m.group(1), PLANETS, "planet"))
+            houses = [house - 1 for house in HOUSE_GROUPS[m.group(2).lower()]]
+            return np.bitwise_or.reduce(self.house_bits[planet, houses], axis=0)
+        m = _DIGNITY.match(term)
+        if m:
+            planet = PLANETS.index(_name(m.group(1), PLANETS, "planet"))
+            return self.dignity_bits[planet, DIGNITIES.index((m.group(2) or m.group(3)).lower())]
+        m = _ASPECTED.match(term)
+        if m:
+            return self.aspect_bits[self._target(m.group(1)), PLANETS.index(_name(m.group(2), PLANETS, "planet"))]
+        m = _ASPECTS.match(term)
+        if m:
+            return self.aspect_bits[self._target(m.group(2)), PLANETS.index(_name(m.group(1), PLANETS, "planet"))]
+        m = _PLANET_IN.match(term)
+        if m and m.group(1).lower() != "lagna":
+            planet = PLANETS.index(_name(m.group(1), PLANETS, "planet"))
+            return self.planet_bits[planet, SIGNS.index(_name(m.group(2), SIGNS, "sign"))]
+        m = _CONJUNCT.match(term)
+        if m:
+            a = PLANETS.index(_name(m.group(1), PLANETS, "planet"))
+            b = PLANETS.index(_name(m.group(2), PLANETS, "planet"))
+            # Same sign for some sign: OR over the 12 per-sign intersections
+            return np.bitwise_or.reduce(self.planet_bits[a] & self.planet_bits[b], axis=0)
+        m = _LAGNA.match(term)
+        if m:
+            return self.lagna_bits[SIGNS.index(_name(m.group(1), SIGNS, "sign"))]
+        m = _KHANDAM.match(term)
+        if m:
+            return self.khandam_bits[list(KHANDAMS).index(_name(m.group(1), KHANDAMS, "Khandam"))]
+        raise ValueError(f"Unrecognised term: {term}")
+
+    def match(self, query):
+        """Row positions matching every AND-ed term of the query."""
+        bits = self.all_bits.copy()
+        for term in re.split(r"\s+and\s+", query.strip(), flags=re.I):
+            if term.strip():
+                bits &= self.term_bits(term)
+        flags = np.unpackbits(bits.view(np.uint8), bitorder="little")[:self.rows]
+        return np.flatnonzero(flags)
+
+    def query(self, query):
+        """Matching chart rows, in Khandam, Lagna, CSV order."""
+        return self.charts.iloc[self.match(query)][RESULT_COLUMNS]
+
+
+def build_index(khandams=None):
+    """ConfigIndex over the charts of the given Khandams (default: all)."""
+    khandams = khandams or available()
+    charts = pd.concat([store.load_charts(khandam) for khandam in khandams], ignore_index=True)
+    derived = pd.concat([store.load_features(khandam) for khandam in khandams], ignore_index=True)
+    return ConfigIndex(charts, derived)
+
+
+class JoinIndex:
+    """ConfigHash -> chart rows of every Khandam, from the store's join index."""
+
+    def __init__(self, joins):
+        self.joins = joins.reset_index(drop=True)
+        self.hashes = self.joins["ConfigHash"].to_numpy()
+
+    def rows(self, config_hash):
+        """Join index rows (Khandam, Lagna, VerseID, Result) with this ConfigHash."""
+        start, stop = np.searchsorted(self.hashes, [config_hash, config_hash + 1])
+        return self.joins.iloc[start:stop]
+
+    def siblings(self, khandam, row):
+        """Rows of the other Khandams with the same Lagna and placements as a chart row."""
+        config_hash = features.row_hash(row)
+        if config_hash < 0:
+            return self.joins.iloc[:0]
+        rows = self.rows(config_hash)
+        return rows[rows["Khandam"] != khandam]
+
+
+def build_join_index():
+    """JoinIndex over the charts of every available Khandam."""
+    return JoinIndex(store.load_joins())
@@ -0,0 +1,247 @@
+"""Chart images rendered from the Lagna and planet columns.
+
+Draws a South-Indian chart: the twelve signs sit in fixed cells around a
+4 x 4 grid, starting with Pisces in the top-left corner, and the centre
+holds the title. Each sign's cell lists its planets (Su, Mo, Ma, ...) and
+"Asc" marks the Lagna. Output is PNG (Pillow) or SVG.
+
+Rendered files live in build/charts/ and are named after a hash of what
+they depict (the placements, title, size and format), so re-rendering an
+unchanged row is free and identical rows share one file.
+`python -m eswaranadi.render` renders every chart row that places at
+least one planet, in a process pool.
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+from PIL import Image, ImageDraw, ImageFont
+
+from eswaranadi import metrics, store
+from eswaranadi.images import ByteLRU
+from eswaranadi.khandams import KHANDAMS, PLANETS, SIGNS, available, path
+
+RENDER_DIR = path("build/charts")
+RENDER_VERSION = 1
+FORMATS = ["png", "svg"]
+SIZE = 480
+CACHE_BYTES = 16 * 1024 * 1024
+
+ABBREVIATIONS = dict(zip(PLANETS, ["Su", "Mo", "Ma", "Me", "Ju", "Ve", "Sa", "Ra", "Ke"]))
+PER_LINE = 2
+BACKGROUND = (255, 255, 180)
+INK = (0, 0, 0)
+LEVELS = 16
+
+# Sign -> (column, row) of its cell in the 4 x 4 grid
+CELLS = {
+    "Pisces": (0, 0), "Aries": (1, 0), "Taurus": (2, 0), "Gemini": (3, 0),
+    "Aquarius": (0, 1), "Cancer": (3, 1),
+    "Capricorn": (0, 2), "Leo": (3, 2),
+    "Sagittarius": (0, 3), "Scorpio": (1, 3), "Libra": (2, 3), "Virgo": (3, 3),
+}
+
+
+def placements(row):
+    """(Lagna, {planet: sign}) of a chart row, keeping only valid sign names."""
+    sign = lambda value: str(value).strip().capitalize() if isinstance(value, str) else None
+    planets = {p: sign(row.get(p)) for p in PLANETS}
+    lagna = sign(row.get("Lagna"))
+    return (lagna if lagna in SIGNS else None), {p: s for p, s in planets.items() if s in SIGNS}
+
+
+def title(row):
+    """Centre text of a row's chart: the Khandam and the chart number from its VerseID."""
+    number = str(row.get("VerseID", "")).rsplit("-", 1)[-1]
+    return ["Eswara Nadi", f"{row.get('Khandam', '')} Khandam", f"Chart-{number}"]
+
+
+def _cell_lines(lagna, planets):
+    labels = {sign: [] for sign in SIGNS}
+    for planet, sign in planets.items():
+        labels[sign].append(ABBREVIATIONS[planet])
+    if lagna:
+        labels[lagna].append("Asc")
+    return {
+        sign: [" ".join(items[i:i + PER_LINE]) for i in range(0, len(items), PER_LINE)]
+        for sign, items in labels.items() if items
+    }
+
+
+def render_svg(lagna, planets, title_lines, size=SIZE):
+    """SVG document of a chart."""
+    cell = size / 4
+    font = cell / 5
+    background, ink = (f"#{r:02x}{g:02x}{b:02x}" for r, g, b in (BACKGROUND, INK))
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" viewBox="0 0 {size} {size}">',
+        f'<rect width="{size}" height="{size}" fill="{background}" stroke="{ink}" stroke-width="2"/>',
+        f'<g stroke="{ink}" stroke-width="1" fill="none">',
+    ]
+    for column, row in CELLS.values():
+        parts.append(f'<rect x="{column * cell:g}" y="{row * cell:g}" width="{cell:g}" height="{cell:g}"/>')
+    parts.append("</g>")
+    parts.append(f'<g font-family="serif" font-size="{font:g}" fill="{ink}" text-anchor="middle">')
+
+    def text_block(lines, cx, cy):
+        top = cy - (len(lines) - 1) * font * 0.6
+        for i, line in enumerate(lines):
+            y = top + i * font * 1.2
+            parts.append(f'<text x="{cx:g}" y="{y:g}" dominant-baseline="middle">{escape(line)}</text>')
+
+    for sign, lines in _cell_lines(lagna, planets).items():
+        column, row = CELLS[sign]
+        text_block(lines, (column + 0.5) * cell, (row + 0.5) * cell)
+    text_block(title_lines, size / 2, size / 2)
+    parts.append("</g></svg>")
+    return "\n".join(parts) + "\n"
+
+
+@lru_cache(maxsize=None)
+def _font(size):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1: fixed-size bitmap font
+        return ImageFont.load_default()
+
+
+# Ink coverage level -> colour, from ink to background
+_PALETTE = [
+    round(ink + (background - ink) * level / (LEVELS - 1))
+    for level in range(LEVELS) for ink, background in zip(INK, BACKGROUND)
+]
+
+
+def render_png(lagna, planets, title_lines, size=SIZE):
+    """PNG bytes of a chart."""
+    cell = size / 4
+    font = _font(int(cell / 5))
+    # Drawn as grayscale ink coverage (0 = ink, 255 = paper), then mapped to
+    # a small two-colour palette: far cheaper than quantizing an RGB image
+    image = Image.new("L", (size, size), 255)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([0, 0, size - 1, size - 1], outline=0, width=2)
+    for column, row in CELLS.values():
+        draw.rectangle([column * cell, row * cell, (column + 1) * cell, (row + 1) * cell], outline=0)
+
+    def text_block(lines, cx, cy):
+        draw.multiline_text((cx, cy), "\n".join(lines), fill=0, font=font, anchor="mm", align="center")
+
+    for sign, lines in _cell_lines(lagna, planets).items():
+        column, row = CELLS[sign]
+        text_block(lines, (column + 0.5) * cell, (row + 0.5) * cell)
+    text_block(title_lines, size / 2, size / 2)
+    image = image.point([value * LEVELS // 256 for value in range(256)])
+    image.putpalette(_PALETTE)
+    out = io.BytesIO()
+    image.save(out, "PNG", optimize=True)
+    return out.getvalue()
+
+
+def chart_key(row, fmt="png", size=SIZE):
+    """Content hash of everything a row's rendered chart depicts."""
+    lagna, planets = placements(row)
+    content = {
+        "version": RENDER_VERSION,
+        "lagna": lagna,
+        "planets": planets,
+        "title": title(row),
+        "size": size,
+        "format": fmt,
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def chart_file(row, fmt="png", size=SIZE, out_dir=RENDER_DIR):
+    """Path of a row's rendered chart, rendering it first unless an identical one exists."""
+    target = os.path.join(out_dir, f"{chart_key(row, fmt, size)}.{fmt}")
+    if not os.path.exists(target):
+        lagna, planets = placements(row)
+        if fmt == "svg":
+            data = render_svg(lagna, planets, title(row), size).encode("utf-8")
+        else:
+            data = render_png(lagna, planets, title(row), size)
+        os.makedirs(out_dir, exist_ok=True)
+        # Per thread as well as per process: the app renders from prefetch threads too
+        tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, target)
+    return target
+
+
+_cache = ByteLRU(CACHE_BYTES)
+
+
+def chart_bytes(row, fmt="png", size=SIZE, out_dir=RENDER_DIR):
+    """Rendered chart of a row, or None when the row places no planet."""
+    if not placements(row)[1]:
+        return None
+    start = time.perf_counter()
+    filename = chart_file(row, fmt, size, out_dir)
+    data = _cache.get(filename)
+    cache = "hit"
+    if data is None:
+        cache = "miss"
+        with open(filename, "rb") as f:
+            data = f.read()
+        _cache.put(filename, data)
+    metrics.observe("image_fetch_seconds", time.perf_counter() - start, variant=f"rendered-{fmt}", cache=cache)
+    return data
+
+
+# Batch rendering
+def _render_job(job):
+    row, fmt, size, out_dir = job
+    existed = os.path.exists(os.path.join(out_dir, f"{chart_key(row, fmt, size)}.{fmt}"))
+    chart_file(row, fmt, size, out_dir)
+    return not existed
+
+
+def chart_rows(khandams=None):
+    """Chart rows (as dicts) of the given Khandams that place at least one planet."""
+    rows = []
+    for khandam in khandams or available():
+        for row in store.chart_records(khandam, None):
+            if placements(row)[1]:
+                rows.append({key: row.get(key) for key in ["Khandam", "Lagna", "VerseID"] + PLANETS})
+    return rows
+
+
+def build(out_dir=RENDER_DIR, khandams=None, formats=("png",), size=SIZE, workers=None):
+    """Render every chart row in each format; returns (rendered, already cached)."""
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = [(row, fmt, size, out_dir) for row in chart_rows(khandams) for fmt in formats]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        rendered = sum(pool.map(_render_job, jobs, chunksize=32))
+    return rendered, len(jobs) - rendered
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render chart images from the chart placements.")
+    parser.add_argument("--out", default=RENDER_DIR, help="output directory (default: build/charts)")
+    parser.add_argument("--format", nargs="+", default=["png"], dest="formats", help="png and/or svg")
+    parser.add_argument("--size", type=int, default=SIZE, help="image side in pixels")
+    parser.add_argument("--workers", type=int, default=None, help="renderer processes (default: CPU count)")
+    parser.add_argument("khandams", nargs="*", help="Khandams to render (default: all)")
+    args = parser.parse_args(argv)
+    unknown = set(args.khandams) - set(KHANDAMS)
+    if unknown:
+        parser.error(f"unknown Khandam: {', '.join(sorted(unknown))}")
+    bad = set(args.formats) - set(FORMATS)
+    if bad:
+        parser.error(f"unknown format: {', '.join(sorted(bad))}")
+    rendered, cached = build(args.out, args.khandams or None, args.formats, args.size, args.workers)
+    print(f"{rendered} charts rendered, {cached} unchanged")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+"""Full-text search over the verses, translations, results and interpretations.
+
+One document per (Khandam, Lagna, VerseID) holds its TamilVerse,
+EnglishTranslation, Result and Concise_ Interpretation text. Tokenising:
+
+* Tamil words are split into grapheme clusters (a letter plus its vowel
+  signs and virama) and indexed as overlapping grapheme trigrams, so
+  "சகோதர" matches "சகோதரர்களுக்கு" and other inflected forms. Words of
+  three graphemes or fewer are indexed whole. A query word shorter than a
+  trigram, such as the root "தாய்", is expanded to every indexed Tamil term
+  that contains it, so it still matches "தாய்க்கு" and "தாயார்". Python's
+  \\w does not cover Tamil vowel signs, hence the explicit Tamil range.
+* Other words are lowercased and indexed whole.
+
+Documents are ranked with BM25. `python -m eswaranadi.search` writes the
+index to build/search/ as plain .npy arrays (CSR postings: term offsets,
+document ids, term frequencies) plus a JSON vocabulary; `load_index`
+memory-maps the arrays, so a query only touches the postings of its own
+terms.
+
+Builds hold an exclusive lock on build.lock and write the arrays under
+unique temporary names into a new generation directory; meta.json, written
+last, names it, so readers see a whole index or the previous one.
+
+meta.json also records the file stamps the index was built from (the
+store manifest, the verse journals and the CSVs). When they have changed,
+`load_index` keeps serving the current index and rebuilds it in a
+background thread, so saved verse edits and rebuilt data become
+searchable without a query waiting for the build.
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import unicodedata
+from collections import Counter
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds of one process are still serialised
+    fcntl = None
+from eswaranadi import journal, store
+from eswaranadi.khandams import available, path
+
+INDEX_DIR = path("build/search")
+META = "meta.json"
+BUILD_LOCK = "build.lock"
+GENERATION_PREFIX = "gen-"
+FIELDS = ["TamilVerse", "EnglishTranslation", "Result", "Concise_ Interpretation"]
+KEY = ["Khandam", "Lagna", "VerseID"]
+NGRAM = 3
+K1 = 1.2
+B = 0.75
+
+_WORD = re.compile(r"[\w\u0B80-\u0BFF]+")
+_TAMIL = re.compile(r"[\u0B80-\u0BFF]")
+
+
+def graphemes(word):
+    """Split a word into grapheme clusters: each base character with its combining marks."""
+    clusters = []
+    for char in word:
+        if clusters and unicodedata.category(char).startswith("M"):
+            clusters[-1] += char
+        else:
+            clusters.append(char)
+    return clusters
+
+
+def tokenize(text):
+    """Index terms of a text: grapheme trigrams for Tamil words, lowercased words otherwise."""
+    terms = []
+    for word in _WORD.findall(unicodedata.normalize("NFC", text or "")):
+        if _TAMIL.search(word):
+            clusters = graphemes(word)
+            if len(clusters) <= NGRAM:
+                terms.append(word)
+            else:
+                terms += ["".join(clusters[i:i + NGRAM]) for i in range(len(clusters) - NGRAM + 1)]
+        else:
+            terms.append(word.lower())
+    return terms
+
+
+# Building
+def documents(khandams=None):
+    """One row per (Khandam, Lagna, VerseID) with the searchable text fields."""
+    frames = []
+    for khandam in khandams or available():
+        charts = store.load_charts(khandam)[KEY + ["Result", "Concise_ Interpretation"]]
+        verses = store.load_verses(khandam)[KEY + ["TamilVerse", "EnglishTranslation"]]
+        for column in ("Khandam", "Lagna"):
+            charts[column] = charts[column].astype(str)
+            verses[column] = verses[column].astype(str)
+        # Pending journal edits are part of the searchable text
+        for (lagna, verse_id), entry in journal.edits(khandam).items():
+            rows = (verses["Lagna"] == lagna) & (verses["VerseID"] == verse_id)
+            verses.loc[rows, "TamilVerse"] = entry["TamilVerse"]
+            verses.loc[rows, "EnglishTranslation"] = entry["EnglishTranslation"]
+        frames.append(charts.merge(verses, on=KEY, how="outer"))
+    docs = pd.concat(frames, ignore_index=True)
+    docs[FIELDS] = docs[FIELDS].fillna("")
+    return docs
+
+
+def index_sources(khandams=None):
+    """{file: [size, mtime] or None} of everything the index is built from."""
+    names = list(khandams or available())
+    stamps = {}
+    for filename in [os.path.join(store.STORE_DIR, store.MANIFEST)] + [journal.journal_path(k) for k in names]:
+        try:
+            st = os.stat(filename)
+            stamps[filename] = [st.st_size, st.st_mtime_ns]
+        except FileNotFoundError:
+            stamps[filename] = None
+    for khandam in names:
+        stamps.update(store.fingerprint(khandam))
+    return stamps
+
+
+_build_thread_lock = threading.Lock()
+
+
+@contextmanager
+def _build_lock(out_dir):
+    """Serialise builds of one index across threads and processes."""
+    os.makedirs(out_dir, exist_ok=True)
+    with _build_thread_lock, open(os.path.join(out_dir, BUILD_LOCK), "a") as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _tmp_name(filename):
+    return f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def _read_meta(out_dir):
+    try:
+        with open(os.path.join(out_dir, META), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def build(out_dir=INDEX_DIR, khandams=None):
+    """Build and write the index; returns the number of documents."""
+    with _build_lock(out_dir):
+        return _build(out_dir, khandams)
+
+
+def _build(out_dir, khandams):
+    # Stamped before reading, so a change made during the build triggers another
+    sources = index_sources(khandams)
+    docs = documents(khandams)
+    counts = [Counter(t for field in FIELDS for t in tokenize(row[field])) for _, row in docs.iterrows()]
+    vocab = sorted(set().union(*counts))
+    term_ids = {term: i for i, term in enumerate(vocab)}
+
+    postings = [[] for _ in vocab]
+    for doc_id, counter in enumerate(counts):
+        for term, tf in counter.items():
+            postings[term_ids[term]].append((doc_id, tf))
+    offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(p) for p in postings])
+    doc_ids = np.fromiter((d for p in postings for d, _ in p), dtype=np.int32, count=offsets[-1])
+    tfs = np.fromiter((tf for p in postings for _, tf in p), dtype=np.float32, count=offsets[-1])
+    doc_len = np.array([sum(c.values()) for c in counts], dtype=np.float32)
+
+    generation = f"{GENERATION_PREFIX}{time.time_ns()}-{os.getpid()}"
+    gen_dir = os.path.join(out_dir, generation)
+    os.makedirs(gen_dir)
+    arrays = {"offsets": offsets, "doc_ids": doc_ids, "tfs": tfs, "doc_len": doc_len}
+    for name, array in arrays.items():
+        target = os.path.join(gen_dir, f"{name}.npy")
+        with open(_tmp_name(target), "wb") as f:
+            np.save(f, array)
+        os.replace(f.name, target)
+
+    previous = (_read_meta(out_dir) or {}).get("generation")
+    meta = {"generation": generation, "vocab": vocab, "docs": docs[KEY].values.tolist(), "sources": sources}
+    target = os.path.join(out_dir, META)
+    with open(_tmp_name(target), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    # meta.json goes last and switches readers to the new generation at once
+    os.replace(f.name, target)
+
+    # Keep the generation readers may still be opening; older ones (and the
+    # arrays of indexes from before generations) go
+    for name in os.listdir(out_dir):
+        if name.startswith(GENERATION_PREFIX) and name not in (generation, previous):
+            shutil.rmtree(os.path.join(out_dir, name), ignore_errors=True)
+        elif name.endswith(".npy"):
+            os.remove(os.path.join(out_dir, name))
+    return len(docs)
+
+
+# Searching
+class SearchIndex:
+    """BM25 index over memory-mapped postings."""
+
+    def __init__(self, index_dir=INDEX_DIR):
+        with open(os.path.join(index_dir, META), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.term_ids = {term: i for i, term in enumerate(meta["vocab"])}
+        self.docs = meta["docs"]
+        self.sources = meta.get("sources")
+        gen_dir = os.path.join(index_dir, meta.get("generation", ""))
+        load = lambda name: np.load(os.path.join(gen_dir, f"{name}.npy"), mmap_mode="r")
+        self.offsets = load("offsets")
+        self.doc_ids = load("doc_ids")
+        self.tfs = load("tfs")
+        self.doc_len = np.asarray(load("doc_len"))
+        self._grams = None
+        self.avg_len = float(self.doc_len.mean()) if len(self.doc_len) else 0.0
+        self.norm = K1 * (1 - B + B * self.doc_len / max(self.avg_len, 1.0))
+
+    def _short_grams(self):
+        # Grapheme 1- and 2-grams -> ids of the indexed Tamil terms containing them,
+        # built on the first short query
+        if self._grams is None:
+            grams = {}
+            for term, term_id in self.term_ids.items():
+                if _TAMIL.search(term):
+                    clusters = graphemes(term)
+                    for n in range(1, NGRAM):
+                        for i in range(len(clusters) - n + 1):
+                            grams.setdefault("".join(clusters[i:i + n]), set()).add(term_id)
+            self._grams = {gram: sorted(ids) for gram, ids in grams.items()}
+        return self._grams
+
+    def _term_ids(self, term):
+        if _TAMIL.search(term) and len(graphemes(term)) < NGRAM:
+            return self._short_grams().get(term, [])
+        term_id = self.term_ids.get(term)
+        return [] if term_id is None else [term_id]
+
+    def postings(self, term):
+        """(document ids, term frequencies) of a query term; a short Tamil term merges its expansions."""
+        term_ids = self._term_ids(term)
+        ids = [self.doc_ids[self.offsets[t]:self.offsets[t + 1]] for t in term_ids]
+        tfs = [self.tfs[self.offsets[t]:self.offsets[t + 1]] for t in term_ids]
+        if len(term_ids) <= 1:
+            return (ids[0], tfs[0]) if ids else (np.zeros(0, np.int32), np.zeros(0, np.float32))
+        ids, inverse = np.unique(np.concatenate(ids), return_inverse=True)
+        return ids, np.bincount(inverse, weights=np.concatenate(tfs)).astype(np.float32)
+
+    def scores(self, query):
+        """BM25 score of every document for the query."""
+        scores = np.zeros(len(self.docs), dtype=np.float32)
+        n = len(self.docs)
+        for term in set(tokenize(query)):
+            ids, tf = self.postings(term)
+            if not len(ids):
+                continue
+            idf = np.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+            # A term's postings name each document once, so plain fancy-index += is safe
+            scores[ids] += idf * tf * (K1 + 1) / (tf + self.norm[ids])
+        return scores
+
+    def search(self, query, k=20):
+        """[(score, (Khandam, Lagna, VerseID))] of the k best documents, best first."""
+        scores = self.scores(query)
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(float(scores[i]), tuple(self.docs[i])) for i in hits]
+
+
+SOURCES_INTERVAL = 1.0  # seconds between checks of the index sources
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+_rebuilding = set()
+
+
+def _rebuild_in_background(index_dir):
+    # One rebuild per index at a time; the thread re-checks under the build lock,
+    # so a rebuild another process has just finished is not repeated
+    with _loaded_lock:
+        if index_dir in _rebuilding:
+            return
+        _rebuilding.add(index_dir)
+
+    def run():
+        try:
+            with _build_lock(index_dir):
+                if (_read_meta(index_dir) or {}).get("sources") != index_sources():
+                    _build(index_dir, None)
+        finally:
+            with _loaded_lock:
+                _rebuilding.discard(index_dir)
+    threading.Thread(target=run, name="search-index", daemon=True).start()
+
+
+def load_index(index_dir=INDEX_DIR):
+    """The persisted index, built first when it does not exist yet.
+
+    The sources are checked at most once every SOURCES_INTERVAL seconds.
+    When they have changed the current index is returned and a background
+    rebuild started; a later call picks up the new meta.json.
+    """
+    filename = os.path.join(index_dir, META)
+    if not os.path.exists(filename):
+        with _build_lock(index_dir):
+            if not os.path.exists(filename):
+                _build(index_dir, None)
+    stamp = os.stat(filename).st_mtime_ns
+    now = time.monotonic()
+    with _loaded_lock:
+        loaded = _loaded.get(index_dir)
+    if loaded is None or loaded[0] != stamp:
+        loaded = [stamp, SearchIndex(index_dir), None]
+    elif loaded[2] is not None and now - loaded[2] < SOURCES_INTERVAL:
+        return loaded[1]
+    loaded[2] = now
+    with _loaded_lock:
+        _loaded[index_dir] = loaded
+    if loaded[1].sources != index_sources():
+        _rebuild_in_background(index_dir)
+    return loaded[1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the full-text search index.")
+    parser.add_argument("--out", default=INDEX_DIR, help="index directory (default: build/search)")
+    parser.add_argument("query", nargs="?", help="run a query against the built index instead")
+    args = parser.parse_args(argv)
+    if args.query:
+        for score, (khandam, lagna, verse_id) in SearchIndex(args.out).search(args.query, 10):
+            print(f"{score:7.3f}  {khandam} {lagna} {verse_id}")
+    else:
+        print(f"{build(args.out)} documents indexed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,503 @@
+"""Read-only JSON HTTP service over the corpus.
+
+    python -m eswaranadi.service serve --port 8765
+    python -m eswaranadi.service loadtest --requests 20000 --concurrency 32
+
+A plain ASGI application, served with uvicorn (see requirements.txt). It
+reads through the same store, journal and index code as the apps:
+
+    GET /khandams                              the available Khandams
+    GET /khandams/<Khandam>                    its Lagnas and their chart counts
+    GET /khandams/<Khandam>/<Lagna>            every chart of the Lagna with its verse
+    GET /khandams/<Khandam>/<Lagna>/<VerseID>  one chart, its verse and its sibling
+                                               readings from the other Khandams
+    GET /query?q=Mars in Aries AND ...&limit=  configuration match (eswaranadi.query)
+    GET /search?q=...&k=20                     verse text search (eswaranadi.search)
+    GET /images/<variant>/<ImagePath>          a chart image: thumb, display or full
+    GET /metrics                               Prometheus metrics of the process
+
+Every response body is serialized once and kept, with its strong ETag (a
+hash of the body), in a byte-bounded in-process LRU keyed by the request
+and by the data generation: the file stamps of the store manifest, the
+verse journals and every Khandam's CSVs. The configuration and join
+indexes are rebuilt when the generation changes too, so a store rebuild
+or a verse edit is picked up on the next request, and a CSV edit within
+a second (the CSVs are stat-ed at most once a second). The search index
+is rebuilt in the background by eswaranadi.search and swapped in when
+ready. Clients revalidate with If-None-Match and get 304 Not Modified
+when nothing changed. Cache misses are computed on a worker thread, off
+the event loop.
+
+Images bypass that cache: a packed image (see eswaranadi.images) is sent
+as a slice of its memory-mapped pack, never copied into Python bytes, with
+its content hash as the ETag.
+
+`loadtest` starts the service in-process (or targets --url) and drives it
+with keep-alive asyncio clients over a mix of paths, first fetching
+bodies and then revalidating them, and prints the request rate and
+latency percentiles of both rounds. It fails when any path is answered
+with anything but a 2xx or 304.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import mimetypes
+import os
+import threading
+import time
+from functools import lru_cache
+from urllib.parse import parse_qsl, quote, unquote, urlsplit
+
+from eswaranadi import images, journal, metrics, store
+from eswaranadi.images import ByteLRU
+from eswaranadi.khandams import KHANDAMS, ROOT, SIGNS, available
+from eswaranadi.query import RESULT_COLUMNS, build_index, build_join_index
+from eswaranadi.search import load_index
+
+HOST = "127.0.0.1"
+PORT = 8765
+CACHE_BYTES = 64 * 1024 * 1024
+QUERY_LIMIT = 1000
+SEARCH_LIMIT = 100
+SOURCES_INTERVAL = 1.0
+
+
+class Body(bytes):
+    """A serialized JSON response body, with its strong ETag."""
+
+    def __new__(cls, payload):
+        body = super().__new__(cls, json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        body.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        return body
+
+
+class NotFound(Exception):
+    pass
+
+
+def _clean(value):
+    # NaN (missing CSV values) is not valid JSON
+    return None if isinstance(value, float) and math.isnan(value) else value
+
+
+def _record(row):
+    return {key: _clean(value) for key, value in row.items()}
+
+
+_sources = {"time": None, "stamps": ()}
+
+
+def _source_stamps():
+    # Stat-ing every CSV costs more than serving a cached response, so the
+    # fingerprints are taken at most once per SOURCES_INTERVAL
+    now = time.monotonic()
+    if _sources["time"] is None or now - _sources["time"] >= SOURCES_INTERVAL:
+        _sources["stamps"] = tuple(
+            tuple((relpath, *stamp) for relpath, stamp in sorted(store.fingerprint(name).items()))
+            for name in available()
+        )
+        _sources["time"] = now
+    return _sources["stamps"]
+
+
+def generation():
+    """File stamps of the store manifest, of every verse journal and of every Khandam's CSVs."""
+    stamps = []
+    for filename in [os.path.join(store.STORE_DIR, store.MANIFEST)] + [journal.journal_path(k) for k in available()]:
+        try:
+            st = os.stat(filename)
+            stamps.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            stamps.append(None)
+    return tuple(stamps) + _source_stamps()
+
+
+# Shared, process-wide indexes, built on first use as in the apps and again
+# whenever the data generation changes
+@lru_cache(maxsize=1)
+def _config_index(stamp):
+    return build_index()
+
+
+@lru_cache(maxsize=1)
+def _join_index(stamp):
+    return build_join_index()
+
+
+def config_index():
+    return _config_index(generation())
+
+
+def join_index():
+    return _join_index(generation())
+
+
+def search_index():
+    # Kept fresh by eswaranadi.search itself, rebuilt off the request path
+    return load_index()
+
+
+# Endpoints
+def _khandam(name):
+    if name not in available():
+        raise NotFound(f"unknown Khandam: {name}")
+    return name
+
+
+def _lagna(name):
+    if name not in SIGNS:
+        raise NotFound(f"unknown Lagna: {name}")
+    return name
+
+
+def _charts(khandam, lagna):
+    verses = store.verse_index(khandam, lagna)
+    charts = []
+    for row in store.chart_records(khandam, lagna):
+        verse = journal.overlay(khandam, verses.get(row["VerseID"])) or {}
+        chart = _record(row)
+        chart["TamilVerse"] = verse.get("TamilVerse")
+        chart["EnglishTranslation"] = verse.get("EnglishTranslation")
+        charts.append(chart)
+    return charts
+
+
+def khandams():
+    return [{"name": name, "title": KHANDAMS[name].title} for name in available()]
+
+
+def khandam(name):
+    charts = store.load_charts(_khandam(name))
+    counts = charts["Lagna"].value_counts(sort=False)
+    return {
+        "name": name,
+        "title": KHANDAMS[name].title,
+        "lagnas": {lagna: int(counts[lagna]) for lagna in SIGNS if counts.get(lagna)},
+    }
+
+
+def lagna(khandam_name, lagna_name):
+    charts = _charts(_khandam(khandam_name), _lagna(lagna_name))
+    return {"Khandam": khandam_name, "Lagna": lagna_name, "charts": charts}
+
+
+def chart(khandam_name, lagna_name, verse_id):
+    for row in _charts(_khandam(khandam_name), _lagna(lagna_name)):
+        if row["VerseID"] == verse_id:
+            siblings = join_index().siblings(khandam_name, row)
+            row["siblings"] = [_record(sibling) for sibling in siblings.drop(columns="ConfigHash").to_dict("records")]
+            return row
+    raise NotFound(f"unknown VerseID: {verse_id}")
+
+
+def query(q, limit=QUERY_LIMIT):
+    results = config_index().query(q)
+    return {
+        "query": q,
+        "count": len(results),
+        "charts": [_record(row) for row in results[RESULT_COLUMNS].head(limit).astype(object).to_dict("records")],
+    }
+
+
+def search(q, k=20):
+    hits = []
+    for score, (khandam_name, lagna_name, verse_id) in search_index().search(q, min(k, SEARCH_LIMIT)):
+        verses = store.verse_index(khandam_name, lagna_name)
+        verse = journal.overlay(khandam_name, verses.get(verse_id)) or {}
+        hits.append({
+            "score": round(score, 4),
+            "Khandam": khandam_name,
+            "Lagna": lagna_name,
+            "VerseID": verse_id,
+            "TamilVerse": verse.get("TamilVerse"),
+            "EnglishTranslation": verse.get("EnglishTranslation"),
+        })
+    return {"query": q, "hits": hits}
+
+
+@lru_cache(maxsize=1)
+def _image_paths(stamp):
+    # Every ImagePath of the chart CSVs, per data generation
+    return frozenset(images.image_paths())
+
+
+def _inside_root(filename):
+    # Normalised, not resolved: image folders may be symlinked into the corpus
+    # (see eswaranadi.synthetic), and the ImagePath has been checked already
+    root = os.path.abspath(ROOT)
+    return os.path.commonpath([root, os.path.abspath(filename)]) == root
+
+
+def image(variant, image_path):
+    """(body, ETag, content type) of a chart image variant; packed images are mmap slices.
+
+    Only ImagePaths of the chart CSVs or of a pack are served, and only
+    from files under the corpus root.
+    """
+    if variant not in list(images.VARIANTS) + ["full"]:
+        raise NotFound(f"unknown image variant: {variant}")
+    packed = images.packed_image(image_path, variant)
+    if packed is not None:
+        body, digest, content_type = packed
+    else:
+        if image_path not in _image_paths(generation()) or not _inside_root(images.variant_file(image_path, variant)):
+            raise NotFound(f"unknown image: {image_path}")
+        body = images.image_bytes(image_path, variant)
+        if body is None:
+            raise NotFound(f"unknown image: {image_path}")
+        digest = hashlib.sha256(body).hexdigest()[:16]
+        content_type = mimetypes.guess_type(images.variant_file(image_path, variant))[0] or "application/octet-stream"
+    return body, f'"{digest}"', content_type
+
+
+def _int(params, name, default):
+    try:
+        return max(1, int(params.get(name, default)))
+    except ValueError:
+        raise ValueError(f"{name} must be a number")
+
+
+def route(parts, params):
+    """Payload of a GET request; raises NotFound or ValueError."""
+    if parts == ["khandams"]:
+        return khandams()
+    if len(parts) == 2 and parts[0] == "khandams":
+        return khandam(parts[1])
+    if len(parts) == 3 and parts[0] == "khandams":
+        return lagna(parts[1], parts[2])
+    if len(parts) == 4 and parts[0] == "khandams":
+        return chart(parts[1], parts[2], parts[3])
+    if parts == ["query"] and params.get("q"):
+        return query(params["q"], _int(params, "limit", QUERY_LIMIT))
+    if parts == ["search"] and params.get("q"):
+        return search(params["q"], _int(params, "k", 20))
+    raise NotFound("no such endpoint")
+
+
+def _route_name(parts):
+    # Metric label of a request path
+    if parts and parts[0] == "khandams":
+        return ["khandams", "khandam", "lagna", "chart"][min(len(parts), 4) - 1]
+    return parts[0] if parts and parts[0] in ("query", "search", "images") else "unknown"
+
+
+def _matches(if_none_match, etag):
+    # Weak comparison, as If-None-Match asks for
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+class Service:
+    """The ASGI application."""
+
+    def __init__(self, cache_bytes=CACHE_BYTES):
+        self.cache = ByteLRU(cache_bytes)
+
+    def _compute(self, parts, params):
+        try:
+            return 200, Body(route(parts, params))
+        except NotFound as e:
+            return 404, Body({"error": str(e)})
+        except ValueError as e:
+            return 400, Body({"error": str(e)})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+
+        start = time.perf_counter()
+        headers = {key.decode("latin-1").lower(): value.decode("latin-1") for key, value in scope["headers"]}
+        parts = [unquote(part) for part in scope["path"].strip("/").split("/") if part]
+        params = dict(parse_qsl(scope["query_string"].decode("latin-1")))
+
+        content_type, etag = b"application/json; charset=utf-8", None
+        if scope["method"] not in ("GET", "HEAD"):
+            name, status, body, cache = "unknown", 405, Body({"error": "read-only service"}), "none"
+        elif parts == ["metrics"]:
+            name, status, cache = "metrics", 200, "none"
+            body = metrics.PROCESS.to_prometheus().encode("utf-8")
+            content_type = b"text/plain; version=0.0.4"
+        elif len(parts) >= 3 and parts[0] == "images":
+            name, status, cache = "images", 200, "none"
+            try:
+                body, etag, image_type = image(parts[1], "/".join(parts[2:]))
+                content_type = image_type.encode("latin-1")
+            except NotFound as e:
+                status, body = 404, Body({"error": str(e)})
+        else:
+            key = (generation(), tuple(parts), tuple(sorted(params.items())))
+            body, cache = self.cache.get(key), "hit"
+            name, status = _route_name(parts), 200
+            if body is None:
+                cache = "miss"
+                status, body = await asyncio.to_thread(self._compute, parts, params)
+                if status == 200:
+                    self.cache.put(key, body)
+
+        etag = etag or getattr(body, "etag", None)
+        response_headers = [(b"content-type", content_type)]
+        if etag and status == 200:
+            response_headers += [(b"etag", etag.encode()), (b"cache-control", b"no-cache")]
+            if _matches(headers.get("if-none-match", ""), etag):
+                status, body = 304, b""
+        response_headers.append((b"content-length", str(len(body)).encode()))
+        await send({"type": "http.response.start", "status": status, "headers": response_headers})
+        # Image bodies may be memoryview slices of a pack: handed to the server as they are
+        await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else body})
+        metrics.observe("service_request_seconds", time.perf_counter() - start, route=name, status=status, cache=cache)
+
+
+app = Service()
+
+
+# Serving
+def serve(host=HOST, port=PORT):
+    import uvicorn
+
+    uvicorn.run(app, host=host, port=port, log_level="warning")
+
+
+def start_in_thread(host=HOST, port=0):
+    """Run the service on a background thread; returns (server, base URL)."""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning", lifespan="off"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, f"http://{host}:{port}"
+
+
+# Load testing
+def default_paths():
+    """A mix of every endpoint over the available Khandams."""
+    paths = ["/khandams"]
+    for name in available():
+        paths.append(f"/khandams/{name}")
+        for sign in SIGNS:
+            charts = store.chart_records(name, sign)
+            if charts:
+                paths.append(f"/khandams/{name}/{sign}")
+                paths.append(f"/khandams/{name}/{sign}/{quote(charts[0]['VerseID'])}")
+    for name in available():
+        for image_path in images.image_paths([name])[:2]:
+            paths += [f"/images/thumb/{quote(image_path)}", f"/images/display/{quote(image_path)}"]
+    for q in ["Mars in Aries", "Jupiter in kendra AND Saturn exalted", "Mars in own sign AND Mars aspected by Jupiter"]:
+        paths.append(f"/query?q={quote(q)}")
+    for q in ["சகோதர", "brother", "mother"]:
+        paths.append(f"/search?q={quote(q)}")
+    return paths
+
+
+async def _read_response(reader):
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        headers[key.strip().lower()] = value.strip()
+    await reader.readexactly(int(headers.get("content-length", 0)))
+    return status, headers.get("etag")
+
+
+async def _client(host, port, jobs, etags, conditional, latencies, statuses, failures):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while jobs:
+            path = jobs.pop()
+            request = f"GET {path} HTTP/1.1\r\nHost: {host}\r\n"
+            if conditional and etags.get(path):
+                request += f"If-None-Match: {etags[path]}\r\n"
+            writer.write((request + "\r\n").encode("utf-8"))
+            start = time.perf_counter()
+            status, etag = await _read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+            if not (200 <= status < 300 or status == 304):
+                failures.setdefault(path, status)
+            if etag:
+                etags.setdefault(path, etag)
+    finally:
+        writer.close()
+
+
+async def _round(host, port, paths, requests, concurrency, etags, conditional, failures):
+    jobs = [paths[i % len(paths)] for i in range(requests)]
+    latencies, statuses = [], {}
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        _client(host, port, jobs, etags, conditional, latencies, statuses, failures) for _ in range(concurrency)
+    ])
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    percentile = lambda q: round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 3)
+    return {
+        "requests": len(latencies),
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": percentile(0.5),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "statuses": {str(status): n for status, n in sorted(statuses.items())},
+    }
+
+
+def load_test(url=None, paths=None, requests=20000, concurrency=32):
+    """Fetch, then revalidate, a mix of paths; returns the timings of both rounds.
+
+    Raises RuntimeError naming the paths answered with anything but a 2xx
+    or 304, since their timings would not measure the service.
+    """
+    server = None
+    if url is None:
+        server, url = start_in_thread()
+    parts = urlsplit(url)
+    paths = paths or default_paths()
+    try:
+        etags, failures = {}, {}
+        # The first pass over the paths fills the service's cache and collects the ETags
+        cold = asyncio.run(_round(parts.hostname, parts.port, paths, len(paths), 1, etags, False, failures))
+        fetch = asyncio.run(_round(parts.hostname, parts.port, paths, requests, concurrency, etags, False, failures))
+        revalidate = asyncio.run(_round(parts.hostname, parts.port, paths, requests, concurrency, etags, True, failures))
+    finally:
+        if server is not None:
+            server.should_exit = True
+    if failures:
+        listed = ", ".join(f"{path} ({status})" for path, status in sorted(failures.items())[:5])
+        raise RuntimeError(f"{len(failures)} of {len(paths)} paths failed: {listed}")
+    return {"paths": len(paths), "cold": cold, "fetch": fetch, "revalidate": revalidate}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Read-only JSON HTTP service over the corpus.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="run the service")
+    serve_parser.add_argument("--host", default=HOST)
+    serve_parser.add_argument("--port", type=int, default=PORT)
+    test_parser = commands.add_parser("loadtest", help="load test the service locally")
+    test_parser.add_argument("--url", help="running service to test (default: start one in-process)")
+    test_parser.add_argument("--requests", type=int, default=20000, help="requests per round")
+    test_parser.add_argument("--concurrency", type=int, default=32, help="keep-alive client connections")
+    args = parser.parse_args(argv)
+    if args.command == "serve":
+        serve(args.host, args.port)
+    else:
+        print(json.dumps(load_test(args.url, requests=args.requests, concurrency=args.concurrency), indent=1))
+
+
+if __name__ == "__main__":
+    main()
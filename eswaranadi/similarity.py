@@ -0,0 +1,108 @@
+"""Rank verse configurations against natal charts.
+
+Every chart row is encoded once into a dense float32 feature vector made of
+four one-hot blocks:
+
+    sign      9 x 12   planet p in sign s
+    house     9 x 12   planet p in house h counted from the Lagna
+    conjunct  36       planets p and q (p < q) in the same sign
+    lagna     12       the Lagna itself
+
+Each block is scaled by its weight and the vectors are L2-normalised, so
+the score of a verse against a natal chart is the cosine similarity of the
+two vectors. A verse only names some of the nine planets; the placements
+it leaves out contribute nothing either way. Scoring a batch of natal
+charts is one (rows x features) @ (features x charts) product followed by
+an argpartition per chart.
+"""
+
+import numpy as np
+import pandas as pd
+
+from eswaranadi import store
+from eswaranadi.khandams import PLANETS, SIGNS, available
+
+DEFAULT_WEIGHTS = {"sign": 1.0, "house": 0.75, "conjunct": 0.5, "lagna": 0.5}
+RESULT_COLUMNS = ["Khandam", "Lagna", "VerseID"] + PLANETS + ["Result", "ImagePath"]
+
+_PAIRS = np.triu_indices(len(PLANETS), 1)
+
+
+def sign_code(value):
+    """SIGNS index of a sign name, -1 when missing or not a sign."""
+    if isinstance(value, str):
+        value = value.strip().capitalize()
+        if value in SIGNS:
+            return SIGNS.index(value)
+    return -1
+
+
+def natal_codes(natal):
+    """(lagna code, planet codes) of a natal chart given as {"Lagna": ..., "Sun": ..., ...}."""
+    return sign_code(natal.get("Lagna")), np.array([sign_code(natal.get(p)) for p in PLANETS])
+
+
+def encode(lagna_codes, planet_codes, weights=DEFAULT_WEIGHTS):
+    """(rows,) Lagna codes and (rows, 9) planet codes -> (rows, features) unit vectors."""
+    lagna_codes = np.asarray(lagna_codes)
+    planet_codes = np.asarray(planet_codes)
+    rows = len(planet_codes)
+    signs = np.arange(len(SIGNS))
+    given = planet_codes >= 0
+
+    sign = (planet_codes[:, :, None] == signs) & given[:, :, None]
+    houses = (planet_codes - lagna_codes[:, None]) % len(SIGNS)
+    house = (houses[:, :, None] == signs) & (given & (lagna_codes[:, None] >= 0))[:, :, None]
+    same = (planet_codes[:, :, None] == planet_codes[:, None, :]) & given[:, :, None] & given[:, None, :]
+    conjunct = same[:, _PAIRS[0], _PAIRS[1]]
+    lagna = lagna_codes[:, None] == signs
+
+    features = np.concatenate([
+        weights["sign"] * sign.reshape(rows, -1),
+        weights["house"] * house.reshape(rows, -1),
+        weights["conjunct"] * conjunct,
+        weights["lagna"] * lagna,
+    ], axis=1).astype(np.float32)
+    norms = np.linalg.norm(features, axis=1, keepdims=True)
+    return features / np.where(norms == 0, 1, norms)
+
+
+class ChartMatcher:
+    """Dense feature matrix over the chart rows of the given Khandams."""
+
+    def __init__(self, charts, weights=DEFAULT_WEIGHTS):
+        self.charts = charts.reset_index(drop=True)
+        self.weights = dict(weights)
+        planet_codes = np.stack([self.charts[p].cat.codes.to_numpy() for p in PLANETS], axis=1)
+        lagna_codes = self.charts["Lagna"].cat.codes.to_numpy()
+        self.features = encode(lagna_codes, planet_codes, self.weights)
+
+    def scores(self, natals):
+        """(rows, len(natals)) cosine scores of every chart row against every natal chart."""
+        codes = [natal_codes(natal) for natal in natals]
+        queries = encode([c[0] for c in codes], np.stack([c[1] for c in codes]), self.weights)
+        return self.features @ queries.T
+
+    def top_k_batch(self, natals, k=10):
+        """(indices, scores), each (len(natals), k), best match first."""
+        scores = self.scores(natals).T
+        k = min(k, scores.shape[1])
+        if k == 0:
+            return np.zeros((len(natals), 0), dtype=int), np.zeros((len(natals), 0), dtype=np.float32)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+    def top_k(self, natal, k=10):
+        """The k best-matching chart rows for one natal chart, with a Score column."""
+        indices, scores = self.top_k_batch([natal], k)
+        result = self.charts.iloc[indices[0]][RESULT_COLUMNS].copy()
+        result.insert(0, "Score", np.round(scores[0], 3))
+        return result.reset_index(drop=True)
+
+
+def build_matcher(khandams=None, weights=DEFAULT_WEIGHTS):
+    """ChartMatcher over the charts of the given Khandams (default: all)."""
+    frames = [store.load_charts(khandam) for khandam in (khandams or available())]
+    return ChartMatcher(pd.concat(frames, ignore_index=True), weights)
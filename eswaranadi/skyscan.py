@@ -0,0 +1,154 @@
+"""Sky-scan: the dates on which a verse's planetary configuration occurs.
+
+    python -m eswaranadi.skyscan Kuja --from 1925-01-01 --to 2025-01-01 Aries-02 Aries-05
+    python -m eswaranadi.skyscan Surya --from 1925-01-01 --to 2025-01-01 -o surya.jsonl
+
+looks up each verse's placements in the bundled sidereal sign table
+(eswaranadi.ephemeris, one row per day from 1900 to 2100) and prints the
+windows of consecutive days on which every planet the chart places is in
+its sign. The Lagna is left out: every Lagna rises once a day. Without
+VerseIDs every chart row of the Khandam that places a planet is scanned.
+
+The table is turned into one bitset per (planet, sign) with one bit per
+day, packed into uint64 words as in eswaranadi.query. A configuration is
+the AND of at most nine of those over the words of the range, so a century
+is a few hundred word operations. Windows are cached per (configuration,
+range); the configuration is the placement part of the chart's ConfigHash,
+so charts with the same placements share one scan whatever their Lagna.
+"""
+
+import argparse
+import datetime
+import json
+import sys
+import time
+from functools import lru_cache
+
+import numpy as np
+
+from eswaranadi import ephemeris, store
+from eswaranadi.features import config_hash, sign_codes
+from eswaranadi.khandams import KHANDAMS, PLANETS, SIGNS
+from eswaranadi.query import pack
+
+CACHE_SIZE = 4096
+
+
+class SkyTable:
+    """Per-day sidereal signs as (planet, sign) bitsets over days."""
+
+    def __init__(self, filename=ephemeris.TABLE):
+        with np.load(filename) as table:
+            signs = table["signs"]
+            self.first = datetime.date.fromordinal(int(table["first"]))
+            if list(table["planets"]) != PLANETS:
+                raise ValueError(f"{filename}: planets are not {', '.join(PLANETS)}")
+        self.days = len(signs)
+        self.last = self.first + datetime.timedelta(days=self.days - 1)
+        # bits[p, s] is the set of days with PLANETS[p] in SIGNS[s]
+        self.bits = pack(signs[:, :, None] == np.arange(len(SIGNS)))
+
+    def _day(self, date):
+        day = (date - self.first).days
+        if not 0 <= day < self.days:
+            raise ValueError(f"{date} is outside the table ({self.first} to {self.last})")
+        return day
+
+    def windows(self, placements, start, end):
+        """[(first, last)] date windows in start..end with every (planet, sign) of placements."""
+        a, b = self._day(start), self._day(end) + 1
+        words = slice(a // 64, -(-b // 64))
+        bits = np.full(words.stop - words.start, ~np.uint64(0))
+        for planet, sign in placements:
+            bits &= self.bits[planet, sign, words]
+        flags = np.unpackbits(bits.view(np.uint8), bitorder="little")[a - words.start * 64:b - words.start * 64]
+        # Window edges are where the flags change
+        edges = np.flatnonzero(np.diff(np.concatenate([[0], flags, [0]]).astype(np.int8)))
+        return [
+            (start + datetime.timedelta(days=int(first)), start + datetime.timedelta(days=int(stop) - 1))
+            for first, stop in zip(edges[::2], edges[1::2])
+        ]
+
+
+@lru_cache(maxsize=None)
+def load_table(filename=ephemeris.TABLE):
+    return SkyTable(filename)
+
+
+def placement_hash(codes):
+    """Placement part of ConfigHash (the Lagna left out) for rows of sign codes; -1 when none."""
+    return config_hash(codes, np.zeros(len(codes), dtype=np.int64))
+
+
+def placements(placement):
+    """[(planet, sign)] decoded from a placement hash."""
+    pairs = []
+    for p in reversed(range(len(PLANETS))):
+        placement, digit = divmod(placement, len(SIGNS) + 1)
+        if digit:
+            pairs.append((p, digit - 1))
+    return sorted(pairs)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def scan_hash(placement, start, end):
+    """Date windows of one placement hash in start..end, cached per (configuration, range)."""
+    return tuple(load_table().windows(placements(placement), start, end))
+
+
+def scan(khandam, start, end, verse_ids=None):
+    """Yield one result dict per chart row of the Khandam (or of the given VerseIDs)."""
+    charts = store.load_charts(khandam)
+    if verse_ids:
+        unknown = set(verse_ids) - set(charts["VerseID"])
+        if unknown:
+            raise ValueError(f"{khandam}: unknown VerseID {', '.join(sorted(unknown))}")
+        charts = charts[charts["VerseID"].isin(verse_ids)].reset_index(drop=True)
+    codes, _ = sign_codes(charts)
+    hashes = placement_hash(codes)
+    for row, placement in zip(charts.to_dict("records"), hashes):
+        if placement < 0:
+            continue
+        windows = scan_hash(int(placement), start, end)
+        yield {
+            "Khandam": khandam,
+            "Lagna": row["Lagna"],
+            "VerseID": row["VerseID"],
+            "placements": {PLANETS[p]: SIGNS[s] for p, s in placements(int(placement))},
+            "days": sum((last - first).days + 1 for first, last in windows),
+            "windows": [[first.isoformat(), last.isoformat()] for first, last in windows],
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find the dates on which verses' planetary configurations occur.")
+    parser.add_argument("khandam", help="Khandam of the verses")
+    parser.add_argument("verse_ids", nargs="*", help="VerseIDs to scan (default: every chart row)")
+    parser.add_argument("--from", dest="start", type=datetime.date.fromisoformat, required=True, help="YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", type=datetime.date.fromisoformat, required=True, help="YYYY-MM-DD")
+    parser.add_argument("-o", "--output", default="-", help="JSON lines output file (default: stdout)")
+    args = parser.parse_args(argv)
+    if args.khandam not in KHANDAMS:
+        parser.error(f"unknown Khandam: {args.khandam}")
+    if args.end < args.start:
+        parser.error("--to is before --from")
+    table = load_table()
+    if args.start < table.first or args.end > table.last:
+        parser.error(f"the table covers {table.first} to {table.last}")
+
+    started = time.perf_counter()
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        n = 0
+        for n, result in enumerate(scan(args.khandam, args.start, args.end, args.verse_ids), 1):
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+    except ValueError as e:
+        parser.error(str(e))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"{n} charts scanned in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
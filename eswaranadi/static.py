@@ -0,0 +1,256 @@
+"""Static HTML/JSON export of the whole corpus.
+
+    python -m eswaranadi.static --out build/site
+
+writes a site that any plain file server can serve, with no Python per
+request:
+
+    index.html                  the Khandams
+    <Khandam>/index.html        its Lagnas and their chart counts
+    <Khandam>/<Lagna>.html      every chart of the Lagna: placements, chart image,
+    <Khandam>/<Lagna>.json      Tamil verse, English translation, Result, interpretation
+    assets/                     chart images: the display variants of
+                                python -m eswaranadi.images (or the originals when
+                                those are not built), and rendered charts for rows
+                                without an image; all named by content hash
+
+Rebuilds are incremental. Every chart row is hashed together with its
+verse, journaled edits included, and its image asset; a page's hash is
+the hash of its rows' hashes. site.json keeps the hash of every page, and
+a page is only written again when its hash changed, so a single verse edit
+rewrites the one Lagna page (and its JSON) that shows it. Pages of Lagnas
+that no longer have charts, and assets no page uses, are removed.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from html import escape
+
+from eswaranadi import images, journal, render, store
+from eswaranadi.khandams import KHANDAMS, PLANETS, SIGNS, available, path
+
+SITE_DIR = path("build/site")
+SITE_VERSION = 1
+MANIFEST = "site.json"
+ASSETS = "assets"
+
+STYLE = (
+    "body{font-family:serif;max-width:60em;margin:auto;padding:1em;line-height:1.5}"
+    "section{border-top:1px solid #ccc;padding:.5em 0}"
+    "img{max-width:100%;height:auto}"
+    ".verse{display:flex;gap:2em}.verse>div{flex:1}"
+)
+
+
+def _digest(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _text(value):
+    return value.strip() if isinstance(value, str) else ""
+
+
+def _write(filename, text):
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    tmp = f"{filename}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, filename)
+
+
+# Assets
+def _asset(row, out_dir):
+    """Site-relative name of a row's chart image, copied into assets/ if new; None without one."""
+    image_path = _text(row.get("ImagePath"))
+    source = images.variant_file(image_path) if image_path else None
+    if source and os.path.exists(source):
+        if os.path.dirname(os.path.abspath(source)) == os.path.abspath(images.IMAGE_DIR):
+            name = os.path.basename(source)  # already named by content hash
+        else:
+            with open(source, "rb") as f:
+                name = hashlib.sha256(f.read()).hexdigest()[:16] + os.path.splitext(source)[1].lower()
+    elif render.placements(row)[1]:
+        source = render.chart_file(row)
+        name = os.path.basename(source)
+    else:
+        return None
+    target = os.path.join(out_dir, ASSETS, name)
+    if not os.path.exists(target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(source, f"{target}.{os.getpid()}.tmp")
+        os.replace(f"{target}.{os.getpid()}.tmp", target)
+    return f"{ASSETS}/{name}"
+
+
+# Page content
+def chart_record(row, verse, asset):
+    """Everything a Lagna page shows of one chart row."""
+    verse = verse or {}
+    return {
+        "VerseID": row["VerseID"],
+        "Lagna": row["Lagna"],
+        "planets": {p: row.get(p) if row.get(p) in SIGNS else None for p in PLANETS},
+        "image": asset,
+        "TamilVerse": _text(verse.get("TamilVerse")),
+        "EnglishTranslation": _text(verse.get("EnglishTranslation")),
+        "Result": _text(row.get("Result")),
+        "Interpretation": _text(row.get("Concise_ Interpretation")),
+    }
+
+
+def lagna_records(khandam, lagna, out_dir):
+    """Chart records of one Lagna page, with verse edits from the journal applied."""
+    verses = store.verse_index(khandam, lagna)
+    return [
+        chart_record(row, journal.overlay(khandam, verses.get(row["VerseID"])), _asset(row, out_dir))
+        for row in store.chart_records(khandam, lagna)
+    ]
+
+
+def _page(title, body, root):
+    return (
+        "<!DOCTYPE html>\n"
+        '<html lang="en">\n<head>\n<meta charset="utf-8">\n'
+        '<meta name="viewport" content="width=device-width, initial-scale=1">\n'
+        f"<title>{escape(title)}</title>\n<style>{STYLE}</style>\n</head>\n<body>\n"
+        f'<p><a href="{root}index.html">Eswara Nadi</a></p>\n'
+        f"{body}\n</body>\n</html>\n"
+    )
+
+
+def _chart_section(record):
+    planets = " | ".join(f"<b>{p}:</b> {escape(sign or '')}" for p, sign in record["planets"].items())
+    parts = [
+        f'<section id="{escape(record["VerseID"])}">',
+        f"<h2>📊 {escape(record['Lagna'])} Lagna — Chart ID: {escape(record['VerseID'])}</h2>",
+        f"<p>{planets}</p>",
+    ]
+    if record["image"]:
+        parts.append(f'<img src="../{record["image"]}" alt="Chart {escape(record["VerseID"])}" loading="lazy">')
+    else:
+        parts.append("<p>📁 Image not available.</p>")
+    if record["TamilVerse"] or record["EnglishTranslation"]:
+        parts.append(
+            '<div class="verse">'
+            f"<div><h3>📝 Tamil Verse</h3><p>{escape(record['TamilVerse'])}</p></div>"
+            f"<div><h3>📘 English Translation</h3><p>{escape(record['EnglishTranslation'])}</p></div>"
+            "</div>"
+        )
+    parts.append(f"<h3>Result:</h3><p>{escape(record['Result'])}</p>")
+    if record["Interpretation"]:
+        parts.append(f"<h3>Interpretation:</h3><p>{escape(record['Interpretation'])}</p>")
+    parts.append("</section>")
+    return "\n".join(parts)
+
+
+def lagna_page(khandam, lagna, records):
+    title = f"{KHANDAMS[khandam].title} — {lagna} Lagna"
+    body = (
+        f'<p><a href="index.html">{escape(KHANDAMS[khandam].title)}</a></p>\n'
+        f"<h1>🔯 Lagna: {escape(lagna)}</h1>\n"
+        + "\n".join(_chart_section(record) for record in records)
+    )
+    return _page(title, body, "../")
+
+
+def khandam_page(khandam, counts):
+    items = "\n".join(
+        f'<li><a href="{lagna}.html">{lagna}</a> ({n} charts)</li>' for lagna, n in counts.items()
+    )
+    title = KHANDAMS[khandam].title
+    return _page(title, f"<h1>🕉️ Eswara Nadi - {escape(title)}</h1>\n<ul>\n{items}\n</ul>", "../")
+
+
+def index_page(khandams):
+    items = "\n".join(
+        f'<li><a href="{name}/index.html">{escape(KHANDAMS[name].title)}</a></li>' for name in khandams
+    )
+    return _page("Eswara Nadi", f"<h1>🕉️ Eswara Nadi</h1>\n<ul>\n{items}\n</ul>", "")
+
+
+# Building
+def build(out_dir=SITE_DIR, khandams=None):
+    """Export the given Khandams (default: all available); returns (written, unchanged, removed) page counts."""
+    names = list(khandams or available())
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            old = json.load(f)
+    except FileNotFoundError:
+        old = {}
+    if old.get("version") != SITE_VERSION:
+        old = {"pages": {}}
+    pages, used = {}, set()
+    written = 0
+
+    def emit(relpath, content_hash, render_files):
+        # render_files() -> {relpath: text} for every file of the page
+        nonlocal written
+        pages[relpath] = content_hash
+        files = [os.path.join(out_dir, name) for name in _page_files(relpath)]
+        if old["pages"].get(relpath) == content_hash and all(map(os.path.exists, files)):
+            return
+        for name, text in render_files().items():
+            _write(os.path.join(out_dir, name), text)
+        written += 1
+
+    for khandam in names:
+        counts = {}
+        for lagna in SIGNS:
+            records = lagna_records(khandam, lagna, out_dir)
+            if not records:
+                continue
+            counts[lagna] = len(records)
+            used.update(record["image"] for record in records if record["image"])
+            content_hash = _digest([SITE_VERSION, khandam, lagna, [_digest(record) for record in records]])
+            emit(f"{khandam}/{lagna}", content_hash, lambda: {
+                f"{khandam}/{lagna}.html": lagna_page(khandam, lagna, records),
+                f"{khandam}/{lagna}.json": json.dumps(
+                    {"Khandam": khandam, "Lagna": lagna, "charts": records}, ensure_ascii=False, indent=1
+                ),
+            })
+        emit(f"{khandam}/index", _digest([SITE_VERSION, khandam, KHANDAMS[khandam].title, counts]),
+             lambda: {f"{khandam}/index.html": khandam_page(khandam, counts)})
+    emit("index", _digest([SITE_VERSION, [KHANDAMS[name].title for name in names]]),
+         lambda: {"index.html": index_page(names)})
+
+    removed = 0
+    for relpath in old["pages"].keys() - pages.keys():
+        for name in _page_files(relpath):
+            try:
+                os.remove(os.path.join(out_dir, name))
+            except FileNotFoundError:
+                pass
+        removed += 1
+    asset_dir = os.path.join(out_dir, ASSETS)
+    for name in set(os.listdir(asset_dir) if os.path.isdir(asset_dir) else []) - {a.split("/", 1)[1] for a in used}:
+        os.remove(os.path.join(asset_dir, name))
+
+    _write(manifest_path, json.dumps({"version": SITE_VERSION, "pages": pages}, indent=1))
+    return written, len(pages) - written, removed
+
+
+def _page_files(relpath):
+    # Lagna pages come with their JSON; index pages are HTML only
+    if relpath.endswith("index"):
+        return [f"{relpath}.html"]
+    return [f"{relpath}.html", f"{relpath}.json"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the corpus as a static HTML/JSON site.")
+    parser.add_argument("--out", default=SITE_DIR, help="site directory (default: build/site)")
+    parser.add_argument("khandams", nargs="*", help="Khandams to export (default: all)")
+    args = parser.parse_args(argv)
+    unknown = set(args.khandams) - set(KHANDAMS)
+    if unknown:
+        parser.error(f"unknown Khandam: {', '.join(sorted(unknown))}")
+    written, unchanged, removed = build(args.out, args.khandams or None)
+    print(f"{written} pages written, {unchanged} unchanged, {removed} removed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,474 @@
+"""Compiled, memory-mapped corpus store.
+
+`python -m eswaranadi.store` compiles every Khandam's chart, verse and
+interpretation CSVs into Arrow IPC files under a new generation directory
+of build/corpus/ (gen-<time>-<pid>/):
+
+    charts.arrow   Khandam, Lagna, VerseID, Sun..Ketu, Result, ImagePath,
+                   Concise_ Interpretation
+    features.arrow the derived houses, conjunctions, aspects, lordships and
+                   dignities of eswaranadi.features, row for row with charts
+    verses.arrow   VerseID, TamilVerse, EnglishTranslation, Lagna, Khandam
+    configs.arrow  the join index: ConfigHash, Khandam, Lagna, VerseID, Result
+                   of every chart row that places a planet, sorted by ConfigHash
+
+Khandam, Lagna and the nine planet columns are dictionary encoded against
+the fixed KHANDAMS / SIGNS lists, so they come back as pandas categoricals
+with the same codes in every Khandam. Each Khandam is one record batch with
+its rows grouped by Lagna; manifest.json records the batch number and the
+row range of every Lagna, which together with the (Lagna, VerseID)
+uniqueness check at build time is the primary index on
+(Khandam, Lagna, VerseID). Readers memory-map the files and only decode the
+batch, or the Lagna slice of it, that is asked for.
+
+The join index spans every Khandam in the build, so the rows sharing a
+chart's configuration across Khandams are found by binary search on
+ConfigHash (eswaranadi.query.JoinIndex).
+
+When the store has not been built, or a Khandam's CSVs changed after the
+build, the loaders compile that Khandam straight from its CSVs instead.
+
+Builds hold an exclusive lock on build.lock and write every file under a
+unique temporary name. manifest.json names the generation directory and
+is replaced last, so a reader sees either the old files and offsets or
+the new ones, never a mix; the generation before the current one is kept
+for readers still opening it. A Khandam's CSVs are fingerprinted before
+they are compiled, so an edit made during a build leaves it stale.
+`update(khandam)` recompiles one Khandam and reuses the other Khandams'
+tables from the current store.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from eswaranadi import features, metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds of one process are still serialised
+    fcntl = None
+from eswaranadi.khandams import KHANDAMS, PLANETS, SIGNS, available, path, source_files
+
+STORE_DIR = path("build/corpus")
+MANIFEST = "manifest.json"
+BUILD_LOCK = "build.lock"
+GENERATION_PREFIX = "gen-"
+STORE_VERSION = 5
+
+CHART_COLUMNS = (
+    ["Khandam", "Lagna", "VerseID"] + PLANETS + ["Result", "ImagePath", "Concise_ Interpretation"]
+)
+VERSE_COLUMNS = ["VerseID", "TamilVerse", "EnglishTranslation", "Lagna", "Khandam"]
+
+_CATEGORY = pa.dictionary(pa.int8(), pa.string())
+CHART_SCHEMA = pa.schema(
+    [("Khandam", _CATEGORY), ("Lagna", _CATEGORY), ("VerseID", pa.string())]
+    + [(planet, _CATEGORY) for planet in PLANETS]
+    + [("Result", pa.string()), ("ImagePath", pa.string()), ("Concise_ Interpretation", pa.string())]
+)
+_MASK = pa.uint16()
+FEATURE_SCHEMA = pa.schema(
+    [
+        field
+        for planet in PLANETS
+        for field in [
+            (f"{planet}_House", pa.int8()),
+            (f"{planet}_Dignity", _CATEGORY),
+            (f"{planet}_Dispositor", _CATEGORY),
+            (f"{planet}_Conjunct", _MASK),
+            (f"{planet}_AspectedBy", _MASK),
+            (f"{planet}_Lords", _MASK),
+        ]
+    ]
+    + [("Lagna_Lord", _CATEGORY), ("Lagna_AspectedBy", _MASK), ("Conjunctions", pa.string()),
+       ("ConfigHash", pa.int64())]
+)
+JOIN_COLUMNS = ["ConfigHash", "Khandam", "Lagna", "VerseID", "Result"]
+JOIN_SCHEMA = pa.schema([
+    ("ConfigHash", pa.int64()),
+    ("Khandam", _CATEGORY),
+    ("Lagna", _CATEGORY),
+    ("VerseID", pa.string()),
+    ("Result", pa.string()),
+])
+VERSE_SCHEMA = pa.schema([
+    ("VerseID", pa.string()),
+    ("TamilVerse", pa.string()),
+    ("EnglishTranslation", pa.string()),
+    ("Lagna", _CATEGORY),
+    ("Khandam", _CATEGORY),
+])
+
+
+# CSV compilation
+def _read_csv(relpath):
+    df = pd.read_csv(path(relpath), encoding="utf-8-sig")
+    df.columns = df.columns.str.strip()
+    return df
+
+
+def _text(series):
+    return series.fillna("").astype(str).str.strip()
+
+
+def _categorize(df, khandam, columns):
+    df["Khandam"] = pd.Categorical([khandam] * len(df), categories=list(KHANDAMS))
+    df["Lagna"] = pd.Categorical(df["Lagna"], categories=SIGNS)
+    bad = df[df["Lagna"].isna()]
+    if not bad.empty:
+        raise ValueError(f"{khandam}: unknown Lagna for VerseID {', '.join(bad['VerseID'])}")
+    dupes = df[df.duplicated(["Lagna", "VerseID"])]
+    if not dupes.empty:
+        raise ValueError(f"{khandam}: duplicate VerseID {', '.join(dupes['VerseID'])}")
+    # Group rows by Lagna, keeping the CSV order inside each Lagna
+    df = df.sort_values("Lagna", kind="stable")
+    return df[columns].reset_index(drop=True)
+
+
+def compile_charts(khandam):
+    k = KHANDAMS[khandam]
+    df = _read_csv(k.chart_csv)
+    df["VerseID"] = _text(df["VerseID"])
+    df["Lagna"] = _text(df["Lagna"]).str.capitalize()
+    df["ImagePath"] = _text(df["ImagePath"])
+    df["Result"] = _text(df["Result"])
+    for planet in PLANETS:
+        # Anything that is not a sign ("Not Given", blanks) becomes missing
+        signs = _text(df[planet]).str.capitalize()
+        df[planet] = pd.Categorical(signs.where(signs.isin(SIGNS)), categories=SIGNS)
+
+    if k.interpretation_csv and os.path.exists(path(k.interpretation_csv)):
+        interp = _read_csv(k.interpretation_csv)
+        interp["VerseID"] = _text(interp["VerseID"])
+        interp["Lagna"] = _text(interp["Lagna"]).str.capitalize()
+        interp = interp[["Lagna", "VerseID", "Concise_ Interpretation"]].drop_duplicates(["Lagna", "VerseID"])
+        df = df.merge(interp, on=["Lagna", "VerseID"], how="left")
+    else:
+        df["Concise_ Interpretation"] = ""
+    df["Concise_ Interpretation"] = _text(df["Concise_ Interpretation"])
+    return _categorize(df, khandam, CHART_COLUMNS)
+
+
+def compile_verses(khandam, lagnas=SIGNS):
+    k = KHANDAMS[khandam]
+    frames = []
+    for lagna in lagnas:
+        filename = k.verse_csv.format(lagna=lagna)
+        if not os.path.exists(path(filename)):
+            continue
+        df = _read_csv(filename)
+        df["VerseID"] = _text(df["VerseID"])
+        df["TamilVerse"] = _text(df["TamilVerse"])
+        df["EnglishTranslation"] = _text(df["EnglishTranslation"])
+        # The file name is authoritative for Lagna and Khandam
+        df["Lagna"] = lagna
+        frames.append(df)
+    if not frames:
+        df = pd.DataFrame({column: pd.Series(dtype=str) for column in VERSE_COLUMNS})
+    else:
+        df = pd.concat(frames, ignore_index=True)
+    return _categorize(df, khandam, VERSE_COLUMNS)
+
+
+# Building
+def join_frame(charts, derived):
+    """Join index rows of chart tables and their features: placed rows only, sorted by ConfigHash."""
+    frames = [
+        chart_df[JOIN_COLUMNS[1:]].assign(ConfigHash=feature_df["ConfigHash"].to_numpy())
+        for chart_df, feature_df in zip(charts, derived)
+    ]
+    if not frames:
+        return pd.DataFrame({column: pd.Series(dtype=object) for column in JOIN_COLUMNS})
+    df = pd.concat(frames, ignore_index=True)[JOIN_COLUMNS]
+    df = df[df["ConfigHash"] >= 0].sort_values("ConfigHash", kind="stable")
+    return df.reset_index(drop=True)
+
+
+def fingerprint(khandam):
+    """{CSV: [size, mtime]} of every source file of a Khandam, as recorded in the manifest."""
+    sources = {}
+    for relpath in source_files(khandam):
+        st = os.stat(path(relpath))
+        sources[relpath] = [st.st_size, st.st_mtime_ns]
+    return sources
+
+
+def _lagna_offsets(df):
+    codes = df["Lagna"].cat.codes.to_numpy()
+    starts = np.searchsorted(codes, np.arange(len(SIGNS)), side="left")
+    stops = np.searchsorted(codes, np.arange(len(SIGNS)), side="right")
+    return {lagna: [int(a), int(b)] for lagna, a, b in zip(SIGNS, starts, stops) if b > a}
+
+
+def _write_atomic(filename, write):
+    tmp = f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        write(tmp)
+        os.replace(tmp, filename)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _to_batch(df, schema):
+    table = pa.Table.from_pandas(df, schema=schema, preserve_index=False).combine_chunks()
+    batches = table.to_batches()
+    if not batches:
+        return pa.record_batch([pa.array([], type=field.type) for field in schema], schema=schema)
+    return batches[0]
+
+
+def _write_batches(filename, schema, frames):
+    def write(tmp):
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+            # Exactly one batch per Khandam, even an empty one, so batch numbers line up
+            for df in frames:
+                writer.write_batch(_to_batch(df, schema))
+    _write_atomic(filename, write)
+
+
+_build_thread_lock = threading.Lock()
+
+
+@contextmanager
+def _build_lock(store_dir):
+    """Serialise builds of one store across threads and processes."""
+    os.makedirs(store_dir, exist_ok=True)
+    with _build_thread_lock, open(os.path.join(store_dir, BUILD_LOCK), "a") as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _compile(khandam):
+    # Fingerprinted first: a CSV edited while it is being compiled then reads as stale
+    sources = fingerprint(khandam)
+    chart_df = compile_charts(khandam)
+    return sources, chart_df, features.derive(chart_df), compile_verses(khandam)
+
+
+def _reuse(khandam, store_dir):
+    # A fresh Khandam's tables straight from the current store
+    opened = _open(store_dir)
+    if opened is None or not is_fresh(khandam, store_dir):
+        return None
+    sources = opened[0]["khandams"][khandam]["sources"]
+    tables = [_load(table, khandam, None, store_dir) for table in ("charts", "features", "verses")]
+    return (sources, *tables)
+
+
+def _write(store_dir, compiled):
+    """Write a new generation directory from {Khandam: _compile result}, then switch the manifest to it."""
+    generation = f"{GENERATION_PREFIX}{time.time_ns()}-{os.getpid()}"
+    gen_dir = os.path.join(store_dir, generation)
+    os.makedirs(gen_dir)
+    manifest = {"version": STORE_VERSION, "generation": generation, "khandams": {}}
+    charts, derived, verses = [], [], []
+    for batch, (khandam, (sources, chart_df, feature_df, verse_df)) in enumerate(compiled.items()):
+        manifest["khandams"][khandam] = {
+            "batch": batch,
+            "sources": sources,
+            "charts": _lagna_offsets(chart_df),
+            "verses": _lagna_offsets(verse_df),
+        }
+        charts.append(chart_df)
+        derived.append(feature_df)
+        verses.append(verse_df)
+
+    _write_batches(os.path.join(gen_dir, "charts.arrow"), CHART_SCHEMA, charts)
+    _write_batches(os.path.join(gen_dir, "features.arrow"), FEATURE_SCHEMA, derived)
+    _write_batches(os.path.join(gen_dir, "configs.arrow"), JOIN_SCHEMA, [join_frame(charts, derived)])
+    _write_batches(os.path.join(gen_dir, "verses.arrow"), VERSE_SCHEMA, verses)
+
+    previous = _manifest_generation(store_dir)
+
+    def write_manifest(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1)
+    # The manifest goes last and switches readers to the new generation at once
+    _write_atomic(os.path.join(store_dir, MANIFEST), write_manifest)
+
+    # Keep the generation readers may still be opening; older ones (and the
+    # files of stores from before generations) go
+    for name in os.listdir(store_dir):
+        if name.startswith(GENERATION_PREFIX) and name not in (generation, previous):
+            shutil.rmtree(os.path.join(store_dir, name), ignore_errors=True)
+        elif name.endswith(".arrow"):
+            os.remove(os.path.join(store_dir, name))
+    return manifest
+
+
+def _manifest_generation(store_dir):
+    try:
+        with open(os.path.join(store_dir, MANIFEST), encoding="utf-8") as f:
+            return json.load(f).get("generation")
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def build(store_dir=STORE_DIR, khandams=None):
+    """Compile the given Khandams (default: all available) into the store and return the manifest."""
+    names = list(khandams or available())
+    with _build_lock(store_dir):
+        return _write(store_dir, {khandam: _compile(khandam) for khandam in names})
+
+
+def update(khandam, store_dir=STORE_DIR):
+    """Recompile one Khandam into the store, reusing the other Khandams that are still fresh.
+
+    Without a store there is nothing to update and None is returned.
+    """
+    with _build_lock(store_dir):
+        if _open(store_dir) is None:
+            return None
+        compiled = {}
+        for name in available():
+            reused = None if name == khandam else _reuse(name, store_dir)
+            compiled[name] = reused or _compile(name)
+        return _write(store_dir, compiled)
+
+
+# Reading
+_opened = {}
+
+
+def _open(store_dir):
+    manifest_path = os.path.join(store_dir, MANIFEST)
+    try:
+        stamp = os.stat(manifest_path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    cached = _opened.get(store_dir)
+    if cached and cached[0] == stamp:
+        return cached[1]
+
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != STORE_VERSION:
+        return None
+    gen_dir = os.path.join(store_dir, manifest["generation"])
+    readers = {
+        table: pa.ipc.open_file(pa.memory_map(os.path.join(gen_dir, f"{table}.arrow")))
+        for table in ("charts", "features", "verses", "configs")
+    }
+    _opened[store_dir] = (stamp, (manifest, readers))
+    return manifest, readers
+
+
+def is_fresh(khandam, store_dir=STORE_DIR):
+    """True when the store holds this Khandam and its CSVs are unchanged since the build."""
+    opened = _open(store_dir)
+    if opened is None:
+        return False
+    entry = opened[0]["khandams"].get(khandam)
+    return entry is not None and entry["sources"] == fingerprint(khandam)
+
+
+def _batch(table, khandam, lagna, store_dir):
+    manifest, readers = _open(store_dir)
+    entry = manifest["khandams"][khandam]
+    batch = readers[table].get_batch(entry["batch"])
+    if lagna is not None:
+        # features.arrow is row for row with charts.arrow
+        start, stop = entry["verses" if table == "verses" else "charts"].get(lagna, [0, 0])
+        batch = batch.slice(start, stop - start)
+    return batch
+
+
+def _load(table, khandam, lagna, store_dir):
+    return _batch(table, khandam, lagna, store_dir).to_pandas()
+
+
+def load_charts(khandam, lagna=None, store_dir=STORE_DIR):
+    """Chart rows of a Khandam, optionally only one Lagna."""
+    if is_fresh(khandam, store_dir):
+        with metrics.timer("store_read_seconds", call="load_charts", source="store"):
+            return _load("charts", khandam, lagna, store_dir)
+    with metrics.timer("store_read_seconds", call="load_charts", source="csv"):
+        df = compile_charts(khandam)
+        if lagna is not None:
+            df = df[df["Lagna"] == lagna].reset_index(drop=True)
+    return df
+
+
+def load_features(khandam, lagna=None, store_dir=STORE_DIR):
+    """Derived features of a Khandam's chart rows (see eswaranadi.features), in load_charts order."""
+    if is_fresh(khandam, store_dir):
+        with metrics.timer("store_read_seconds", call="load_features", source="store"):
+            return _load("features", khandam, lagna, store_dir)
+    with metrics.timer("store_read_seconds", call="load_features", source="csv"):
+        return features.derive(load_charts(khandam, lagna, store_dir))
+
+
+def load_verses(khandam, lagna=None, store_dir=STORE_DIR):
+    """Verse rows of a Khandam, optionally only one Lagna."""
+    if is_fresh(khandam, store_dir):
+        with metrics.timer("store_read_seconds", call="load_verses", source="store"):
+            return _load("verses", khandam, lagna, store_dir)
+    with metrics.timer("store_read_seconds", call="load_verses", source="csv"):
+        return compile_verses(khandam, SIGNS if lagna is None else [lagna])
+
+
+def load_joins(store_dir=STORE_DIR):
+    """Join index rows (see join_frame) of every available Khandam."""
+    khandams = available()
+    opened = _open(store_dir)
+    # Only the build's own index when it covers exactly these Khandams, all fresh
+    if opened and list(opened[0]["khandams"]) == khandams and all(is_fresh(k, store_dir) for k in khandams):
+        with metrics.timer("store_read_seconds", call="load_joins", source="store"):
+            return opened[1]["configs"].get_batch(0).to_pandas()
+    with metrics.timer("store_read_seconds", call="load_joins", source="csv"):
+        charts = [load_charts(khandam, store_dir=store_dir) for khandam in khandams]
+        return join_frame(charts, [features.derive(chart_df) for chart_df in charts])
+
+
+# Per-Lagna records for rendering
+def chart_records(khandam, lagna, store_dir=STORE_DIR):
+    """Chart rows of one Lagna as plain dicts, in CSV order; missing values are None or NaN."""
+    if is_fresh(khandam, store_dir):
+        with metrics.timer("store_read_seconds", call="chart_records", source="store"):
+            return _batch("charts", khandam, lagna, store_dir).to_pylist()
+    # The CSV fallback is timed by load_charts
+    return load_charts(khandam, lagna, store_dir).to_dict("records")
+
+
+def verse_index(khandam, lagna, store_dir=STORE_DIR):
+    """VerseID -> verse dict for one Lagna, so a chart finds its verse in O(1)."""
+    if is_fresh(khandam, store_dir):
+        with metrics.timer("store_read_seconds", call="verse_index", source="store"):
+            records = _batch("verses", khandam, lagna, store_dir).to_pylist()
+    else:
+        records = load_verses(khandam, lagna, store_dir).to_dict("records")
+    return {record["VerseID"]: record for record in records}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile the Khandam CSVs into the corpus store.")
+    parser.add_argument("--out", default=STORE_DIR, help="store directory (default: build/corpus)")
+    parser.add_argument("khandams", nargs="*", help="Khandams to compile (default: all)")
+    args = parser.parse_args(argv)
+    unknown = set(args.khandams) - set(KHANDAMS)
+    if unknown:
+        parser.error(f"unknown Khandam: {', '.join(sorted(unknown))}")
+    manifest = build(args.out, args.khandams or None)
+    for khandam, entry in manifest["khandams"].items():
+        charts = sum(b - a for a, b in entry["charts"].values())
+        verses = sum(b - a for a, b in entry["verses"].values())
+        print(f"{khandam}: {charts} charts, {verses} verses")
+
+
+if __name__ == "__main__":
+    main()
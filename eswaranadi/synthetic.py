@@ -0,0 +1,138 @@
+"""Synthetic Eswara Nadi corpora for benchmarking.
+
+    python -m eswaranadi.synthetic --verses 60 --out build/synthetic/n60
+
+writes 7 Khandams x 12 Lagnas x N verses in the layout and CSV schemas of
+the real ones, plus a khandams.json registry. Every row is a real chart
+row rotated onto its new Lagna (so the houses, and with them the Result,
+stay consistent) together with that row's verse text and ImagePath. The
+real image folders are linked into the corpus, so the rows that have an
+image in the repository have one here too.
+
+Point the package at the corpus with ESWARANADI_ROOT=<out>; from then on
+the store, the indexes and the apps read it instead of the repository.
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+
+import pandas as pd
+
+from eswaranadi import store
+from eswaranadi.khandams import KHANDAMS, PLANETS, REGISTRY, SIGNS, available, path
+
+NAMES = list(KHANDAMS)
+CHART_HEADER = ["Lagna", "VerseID"] + PLANETS + ["Result", "ImagePath"]
+VERSE_HEADER = ["VerseID", "TamilVerse", "EnglishTranslation", "Lagna", "Khandam"]
+
+
+def templates():
+    """Real chart rows that place at least one planet, with their verse text."""
+    rows = []
+    for khandam in available():
+        charts = store.load_charts(khandam)
+        verses = store.load_verses(khandam)
+        verses = verses.astype({"Lagna": str}).set_index(["Lagna", "VerseID"])
+        for row in charts.astype({"Lagna": str}).to_dict("records"):
+            if not any(isinstance(row[p], str) for p in PLANETS):
+                continue
+            key = (row["Lagna"], row["VerseID"])
+            verse = verses.loc[key] if key in verses.index else None
+            row["TamilVerse"] = verse["TamilVerse"] if verse is not None else ""
+            row["EnglishTranslation"] = verse["EnglishTranslation"] if verse is not None else ""
+            row["Source"] = khandam
+            rows.append(row)
+    return rows
+
+
+def _rotate(sign, shift):
+    return SIGNS[(SIGNS.index(sign) + shift) % len(SIGNS)] if isinstance(sign, str) else ""
+
+
+def _link_images(out_dir):
+    for khandam in map(KHANDAMS.get, available()):
+        link = os.path.join(out_dir, "images", khandam.name)
+        if os.path.lexists(link):
+            continue
+        os.makedirs(os.path.dirname(link), exist_ok=True)
+        try:
+            os.symlink(path(khandam.image_dir), link, target_is_directory=True)
+        except OSError:  # no symlinks (Windows without privileges): copy
+            shutil.copytree(path(khandam.image_dir), link)
+
+
+def generate(out_dir, verses=60, names=NAMES, seed=0):
+    """Write a corpus of len(names) Khandams x 12 Lagnas x `verses` rows; returns its registry."""
+    rng = random.Random(seed)
+    pool = templates()
+    os.makedirs(out_dir, exist_ok=True)
+    _link_images(out_dir)
+    width = max(2, len(str(verses)))
+
+    registry = []
+    for name in names:
+        folder = f"{name}_Khandam"
+        entry = {
+            "name": name,
+            "title": f"{name} Khandam",
+            "folder": folder,
+            "chart_csv": f"{folder}/{name}_Khandam.csv",
+            "verse_csv": f"{folder}/{name}_Verses_{{lagna}}.csv",
+            "interpretation_csv": None,
+            "image_dir": f"{folder}/images",
+        }
+        os.makedirs(os.path.join(out_dir, folder), exist_ok=True)
+        charts = []
+        for lagna in SIGNS:
+            verse_rows = []
+            for i in range(1, verses + 1):
+                template = rng.choice(pool)
+                shift = SIGNS.index(lagna) - SIGNS.index(template["Lagna"])
+                verse_id = f"{lagna}-{i:0{width}d}"
+                image_path = template["ImagePath"] if isinstance(template["ImagePath"], str) else ""
+                source_dir = KHANDAMS[template["Source"]].image_dir
+                if image_path.startswith(source_dir + "/"):
+                    image_path = f"images/{template['Source']}/{image_path[len(source_dir) + 1:]}"
+                chart = {"Lagna": lagna, "VerseID": verse_id, "Result": template["Result"], "ImagePath": image_path}
+                chart.update({p: _rotate(template[p], shift) for p in PLANETS})
+                charts.append(chart)
+                verse_rows.append({
+                    "VerseID": verse_id,
+                    "TamilVerse": template["TamilVerse"],
+                    "EnglishTranslation": template["EnglishTranslation"],
+                    "Lagna": lagna,
+                    "Khandam": name,
+                })
+            pd.DataFrame(verse_rows, columns=VERSE_HEADER).to_csv(
+                os.path.join(out_dir, entry["verse_csv"].format(lagna=lagna)), index=False, encoding="utf-8-sig"
+            )
+        pd.DataFrame(charts, columns=CHART_HEADER).to_csv(
+            os.path.join(out_dir, entry["chart_csv"]), index=False, encoding="utf-8-sig"
+        )
+        registry.append(entry)
+
+    with open(os.path.join(out_dir, REGISTRY), "w", encoding="utf-8") as f:
+        json.dump(registry, f, indent=1)
+    return registry
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic Eswara Nadi corpus.")
+    parser.add_argument("--verses", type=int, default=60, help="verses per Lagna and Khandam")
+    parser.add_argument("--khandams", type=int, default=len(NAMES), help=f"number of Khandams (at most {len(NAMES)})")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="corpus directory (default: build/synthetic/n<verses>)")
+    args = parser.parse_args(argv)
+    if not 1 <= args.khandams <= len(NAMES):
+        parser.error(f"--khandams must be between 1 and {len(NAMES)}")
+    out = args.out or path(f"build/synthetic/n{args.verses}")
+    registry = generate(out, args.verses, NAMES[:args.khandams], args.seed)
+    print(f"{len(registry)} Khandams x {len(SIGNS)} Lagnas x {args.verses} verses in {out}")
+    print(f"Use it with ESWARANADI_ROOT={out}")
+
+
+if __name__ == "__main__":
+    main()
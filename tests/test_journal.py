@@ -0,0 +1,81 @@
+"""The verse edit journal, on a copy of one Khandam's verse CSVs."""
+
+import json
+import os
+import shutil
+import threading
+
+import pandas as pd
+import pytest
+
+from eswaranadi import journal, khandams
+
+KHANDAM = "Surya"
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    folder = khandams.KHANDAMS[KHANDAM].folder
+    shutil.copytree(khandams.path(folder), tmp_path / folder, ignore=shutil.ignore_patterns("images", "verse_edits.*"))
+    monkeypatch.setattr(journal, "path", lambda relpath: os.path.join(tmp_path, relpath))
+    monkeypatch.setattr(journal, "_tails", {})
+    return tmp_path
+
+
+def verse_csv(corpus, lagna):
+    relpath = khandams.KHANDAMS[KHANDAM].verse_csv.format(lagna=lagna)
+    return pd.read_csv(corpus / relpath, encoding="utf-8-sig", dtype=str, keep_default_na=False)
+
+
+def first_verse(corpus):
+    row = verse_csv(corpus, "Aries").iloc[0]
+    return row["VerseID"].strip(), journal.verse_version(row["TamilVerse"], row["EnglishTranslation"])
+
+
+def test_save_and_conflict(corpus):
+    verse_id, base = first_verse(corpus)
+    version = journal.save(KHANDAM, "Aries", verse_id, "புதிய", "new", base)
+    assert journal.edits(KHANDAM)[("Aries", verse_id)]["version"] == version
+
+    # A second editor still holding the CSV version loses
+    with pytest.raises(journal.ConflictError) as error:
+        journal.save(KHANDAM, "Aries", verse_id, "வேறு", "other", base)
+    assert error.value.current["version"] == version
+
+    journal.save(KHANDAM, "Aries", verse_id, "மீண்டும்", "again", version)
+    assert journal.overlay(KHANDAM, {"Lagna": "Aries", "VerseID": verse_id})["EnglishTranslation"] == "again"
+
+
+def test_compact_writes_csv_and_keeps_versions(corpus):
+    verse_id, base = first_verse(corpus)
+    version = journal.save(KHANDAM, "Aries", verse_id, "புதிய", "new", base)
+
+    assert journal.compact(KHANDAM) == 1
+    row = verse_csv(corpus, "Aries").iloc[0]
+    assert (row["TamilVerse"], row["EnglishTranslation"]) == ("புதிய", "new")
+    with open(journal.journal_path(KHANDAM), encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f]
+    assert [(e["VerseID"], e["compacted"]) for e in entries] == [(verse_id, True)]
+
+    # Nothing left to fold in, and the version still guards the next save
+    assert journal.compact(KHANDAM) == 0
+    with pytest.raises(journal.ConflictError):
+        journal.save(KHANDAM, "Aries", verse_id, "வேறு", "other", base)
+    journal.save(KHANDAM, "Aries", verse_id, "வேறு", "other", version)
+
+
+def test_save_compacts_in_background(corpus, monkeypatch):
+    monkeypatch.setattr(journal, "COMPACT_AFTER", 3)
+    updated = []
+    monkeypatch.setattr(journal, "update_store", updated.append)
+    rows = verse_csv(corpus, "Aries").head(3)
+    for _, row in rows.iterrows():
+        base = journal.verse_version(row["TamilVerse"], row["EnglishTranslation"])
+        journal.save(KHANDAM, "Aries", row["VerseID"].strip(), "திருத்தம்", f"edit {row['VerseID']}", base)
+    for thread in threading.enumerate():
+        if thread.name == f"compact-{KHANDAM}":
+            thread.join()
+
+    assert updated == [KHANDAM]
+    compacted = verse_csv(corpus, "Aries").head(3)
+    assert (compacted["EnglishTranslation"] == [f"edit {v}" for v in rows["VerseID"]]).all()
@@ -0,0 +1,57 @@
+"""Bitset configuration queries against a plain pandas filter of the same charts."""
+
+import pandas as pd
+import pytest
+
+from eswaranadi import query
+from eswaranadi.khandams import PLANETS, SIGNS
+
+
+@pytest.fixture(scope="module")
+def index():
+    return query.build_index()
+
+
+@pytest.fixture(scope="module")
+def derived(index):
+    return query.features.derive(index.charts)
+
+
+def house(charts, planet):
+    """House counted from the Lagna; 0 for a planet the row does not place."""
+    sign = charts[planet].map(lambda s: SIGNS.index(s) if isinstance(s, str) else None).astype(float)
+    lagna = charts["Lagna"].map(SIGNS.index).astype(int)
+    return ((sign - lagna) % 12 + 1).fillna(0).astype(int)
+
+
+def aspected_by(derived, target, planet):
+    return pd.Series(derived[f"{target}_AspectedBy"].to_numpy().astype(int) >> PLANETS.index(planet) & 1 == 1)
+
+
+FILTERS = {
+    "Mars in Aries": lambda c, d: c["Mars"] == "Aries",
+    "mars IN aries and Jupiter in Libra": lambda c, d: (c["Mars"] == "Aries") & (c["Jupiter"] == "Libra"),
+    "Ketu conjunct Mars": lambda c, d: c["Ketu"].notna() & (c["Ketu"] == c["Mars"]),
+    "Mars in house 4": lambda c, d: house(c, "Mars") == 4,
+    "Saturn in 10th house": lambda c, d: house(c, "Saturn") == 10,
+    "Jupiter in kendra": lambda c, d: house(c, "Jupiter").isin([1, 4, 7, 10]),
+    "Mars in own sign": lambda c, d: d["Mars_Dignity"] == "own",
+    "Saturn exalted AND Lagna Libra": lambda c, d: (d["Saturn_Dignity"] == "exalted") & (c["Lagna"] == "Libra"),
+    "Mars aspected by Jupiter": lambda c, d: aspected_by(d, "Mars", "Jupiter"),
+    "Lagna aspected by Saturn": lambda c, d: aspected_by(d, "Lagna", "Saturn"),
+    "Khandam Kuja AND Sun in Gemini": lambda c, d: (c["Khandam"] == "Kuja") & (c["Sun"] == "Gemini"),
+}
+
+
+@pytest.mark.parametrize("text", list(FILTERS))
+def test_query_matches_pandas_filter(index, derived, text):
+    expected = index.charts[FILTERS[text](index.charts, derived).fillna(False).astype(bool)]
+    result = index.query(text)
+    assert len(expected)
+    pd.testing.assert_frame_equal(result, expected[query.RESULT_COLUMNS])
+
+
+@pytest.mark.parametrize("text", ["Mars in Atlantis", "Mars in house 13", "Mars loves Venus"])
+def test_bad_terms_raise(index, text):
+    with pytest.raises(ValueError):
+        index.query(text)
@@ -0,0 +1,63 @@
+"""Full-text search over the repository's Khandams."""
+
+import json
+import threading
+
+import pytest
+
+from eswaranadi import search
+
+
+@pytest.fixture(scope="module")
+def index(tmp_path_factory):
+    out = str(tmp_path_factory.mktemp("search"))
+    search.build(out)
+    return search.SearchIndex(out)
+
+
+@pytest.fixture(scope="module")
+def documents():
+    docs = search.documents()
+    return docs, docs[search.FIELDS].agg(" ".join, axis=1)
+
+
+@pytest.mark.parametrize("root", ["தாய்", "பிதா", "மனை"])
+def test_short_root_finds_its_inflected_forms(index, documents, root):
+    docs, text = documents
+    expected = {tuple(key) for key in docs.loc[text.str.contains(root, regex=False), search.KEY].values.tolist()}
+    found = {key for _, key in index.search(root, len(docs))}
+    assert found == expected
+    # Some of them only have the root inside a longer word
+    inflected = text[text.str.contains(root, regex=False)].map(lambda t: root not in t.split())
+    assert inflected.any()
+
+
+def test_long_word_matches_by_trigrams(index, documents):
+    docs, text = documents
+    found = {key for _, key in index.search("சகோதர", len(docs))}
+    expected = {tuple(key) for key in docs.loc[text.str.contains("சகோதர", regex=False), search.KEY].values.tolist()}
+    assert expected <= found
+
+
+def test_tokenize_short_tamil_words_whole():
+    assert search.tokenize("தாய் brother") == ["தாய்", "brother"]
+
+
+def test_stale_index_is_served_while_rebuilt(tmp_path, monkeypatch):
+    out = str(tmp_path)
+    search.build(out)
+    with open(tmp_path / search.META, encoding="utf-8") as f:
+        meta = json.load(f)
+    meta["sources"] = {}
+    with open(tmp_path / search.META, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    monkeypatch.setattr(search, "SOURCES_INTERVAL", 0)
+
+    stale = search.load_index(out)
+    assert stale.sources == {}
+    for thread in threading.enumerate():
+        if thread.name == "search-index":
+            thread.join()
+    fresh = search.load_index(out)
+    assert fresh.sources == search.index_sources()
+    assert len([name for name in tmp_path.iterdir() if name.name.startswith(search.GENERATION_PREFIX)]) == 2